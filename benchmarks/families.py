@@ -0,0 +1,33 @@
+import random
+
+from automaton import DFA, NFA
+from generator import counter_dfa, epsilon_chain, nth_from_last
+
+# Scaling families used by the benchmarks, as descriptions in the load_from_json schema.
+# The generator families are deterministic, so runs on different machines or commits
+# measure exactly the same automata and inputs.
+
+def build(description):
+    # Same construction as load_from_json, without the progress message
+    automaton_class = NFA if "<EPSILON>" in description["alphabet"] else DFA
+    edges = ((edge["state"], edge["input"], edge["next_state"]) for edge in description["delta"])
+    return automaton_class.from_edges(description["states"], edges, description["start_state"], description["accept_states"], description["alphabet"])
+
+def cycle_dfa(num_states, alphabet_size=2):
+    # Every state is distinguishable, the first symbol walks the cycle and the others reset it
+    return counter_dfa(num_states, alphabet_size).to_json()
+
+def nth_from_last_nfa(n):
+    # (a|b)*a(a|b){n}: the minimal DFA for this language needs 2^(n+1) states
+    return nth_from_last(n).to_json()
+
+def nth_from_last_regex(n):
+    return "(a|b)*a" + "(a|b)" * n
+
+def epsilon_chain_nfa(length):
+    return epsilon_chain(length).to_json()
+
+def random_input(alphabet, length, seed=0):
+    symbols = sorted(symbol for symbol in alphabet if symbol != "<EPSILON>")
+    generator = random.Random(seed)
+    return "".join(generator.choices(symbols, k=length))
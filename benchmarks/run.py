@@ -0,0 +1,168 @@
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.insert(0, src_dir)
+
+from families import build, cycle_dfa, epsilon_chain_nfa, nth_from_last_nfa, nth_from_last_regex, random_input
+from loader import load_from_json, load_from_regex
+
+class Case:
+    # One benchmark: setup() runs once and returns (operation, symbols), operation is then timed.
+    # symbols is the work done by one operation, used for the time per symbol: input length for
+    # process_string, delta entries for load_from_json and pattern length for load_from_regex.
+
+    def __init__(self, name, setup, quick=True):
+        self.name = name
+        self.setup = setup
+        self.quick = quick
+
+def dfa_process(description, length):
+    def setup():
+        dfa = build(description)
+        input_string = random_input(description["alphabet"], length)
+        return (lambda: dfa.process_string(input_string)), length
+    return setup
+
+def nfa_process(description, length):
+    def setup():
+        nfa = build(description)
+        input_string = random_input(description["alphabet"], length)
+        return (lambda: nfa.process_string(input_string, nfa.start_state)), length
+    return setup
+
+def json_load(description):
+    def setup():
+        def operation():
+            with redirect_stdout(io.StringIO()):
+                load_from_json(description)
+        return operation, len(description["delta"])
+    return setup
+
+def regex_load(pattern):
+    def setup():
+        return (lambda: load_from_regex(pattern, cached=False)), len(pattern)
+    return setup
+
+def cases():
+    yield from (Case(f"dfa_process_string/long_input/n={n}", dfa_process(cycle_dfa(8), n), n <= 10 ** 4) for n in (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6))
+    yield from (Case(f"dfa_process_string/many_states/states={n}", dfa_process(cycle_dfa(n), 10 ** 4), n <= 10 ** 3) for n in (10, 10 ** 3, 10 ** 5))
+    yield from (Case(f"dfa_process_string/large_alphabet/symbols={n}", dfa_process(cycle_dfa(4, n), 10 ** 4), n <= 256) for n in (2, 256, 4096))
+
+    yield from (Case(f"nfa_process_string/long_input/n={n}", nfa_process(nth_from_last_nfa(4), n), n <= 10 ** 4) for n in (10 ** 3, 10 ** 4, 10 ** 5))
+    yield from (Case(f"nfa_process_string/nth_from_last/n={n}", nfa_process(nth_from_last_nfa(n), 10 ** 4), n <= 8) for n in (2, 8, 32))
+    yield from (Case(f"nfa_process_string/epsilon_chain/length={n}", nfa_process(epsilon_chain_nfa(n), 10 ** 3), n <= 16) for n in (4, 16, 64))
+
+    yield from (Case(f"load_from_json/dfa_many_states/states={n}", json_load(cycle_dfa(n)), n <= 10 ** 3) for n in (10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5))
+    yield from (Case(f"load_from_json/dfa_large_alphabet/symbols={n}", json_load(cycle_dfa(16, n)), n <= 256) for n in (16, 256, 4096))
+    yield from (Case(f"load_from_json/nfa_nth_from_last/n={n}", json_load(nth_from_last_nfa(n)), n <= 64) for n in (8, 64, 1024))
+
+    yield from (Case(f"load_from_regex/nth_from_last/n={n}", regex_load(nth_from_last_regex(n)), n <= 4) for n in (2, 4, 8))
+    yield from (Case(f"load_from_regex/literal/length={n}", regex_load("abc" * (n // 3)), n <= 96) for n in (12, 96, 768))
+
+def measure(operation, symbols, repeat=5, min_time=0.2):
+    # Calibrate a loop count that runs for at least min_time, keep the best of repeat rounds
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            operation()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or loops >= 1 << 20:
+            break
+        loops *= 2
+
+    best = elapsed / loops
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            operation()
+        best = min(best, (time.perf_counter() - started) / loops)
+
+    # Memory is measured in a separate run because tracing slows the operation down
+    tracemalloc.start()
+    try:
+        operation()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds_per_op": best,
+        "ops_per_second": 1 / best if best else 0.0,
+        "ns_per_symbol": best / symbols * 1e9 if symbols else None,
+        "peak_bytes": peak,
+        "loops": loops,
+    }
+
+def run(quick=False, filter_text=None, repeat=5, min_time=0.2, report=None):
+    results = {}
+    for case in cases():
+        if quick and not case.quick:
+            continue
+        if filter_text and filter_text not in case.name:
+            continue
+        operation, symbols = case.setup()
+        results[case.name] = measure(operation, symbols, repeat, min_time)
+        if report:
+            report(case.name, results[case.name])
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": quick,
+        "results": results,
+    }
+
+def compare(current, baseline, threshold=0.1):
+    # A case regresses when its time per operation grew by more than threshold (0.1 = 10%)
+    regressions = []
+    for name, result in current["results"].items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            continue
+        ratio = result["seconds_per_op"] / previous["seconds_per_op"]
+        if ratio > 1 + threshold:
+            regressions.append((name, previous["seconds_per_op"], result["seconds_per_op"], ratio))
+    return regressions
+
+def format_result(name, result):
+    per_symbol = f"{result['ns_per_symbol']:10.1f} ns/symbol" if result["ns_per_symbol"] is not None else ""
+    return f"{name:55} {result['ops_per_second']:12.1f} ops/s {per_symbol} {result['peak_bytes'] / 1024:10.1f} KiB peak"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the DFA and NFA simulators and the loaders.")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results saved earlier with --output")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown before a case counts as a regression (default 0.1 = 10%%)")
+    parser.add_argument("--filter", help="only run cases whose name contains this text")
+    parser.add_argument("--quick", action="store_true", help="skip the largest sizes of every family")
+    parser.add_argument("--repeat", type=int, default=5, help="timed rounds per case, the best one is kept")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds per timed round")
+    options = parser.parse_args(argv)
+
+    current = run(options.quick, options.filter, options.repeat, options.min_time, lambda name, result: print(format_result(name, result), flush=True))
+
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as output:
+            json.dump(current, output, indent=2)
+
+    if options.baseline:
+        with open(options.baseline, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(current, baseline, options.threshold)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: {before * 1e6:.1f}us -> {after * 1e6:.1f}us ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No regressions above {options.threshold:.0%} against {options.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
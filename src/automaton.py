@@ -1,15 +1,37 @@
+import time
+from math import isqrt
+from types import MappingProxyType
+
+from compiled import CompiledDFA
+from instrumentation import Stats
+from parallel import PARALLEL_THRESHOLD, parallel_available, process_parallel
+
 class State:
+    __slots__ = ("name", "transitions", "edges")
+
     def __init__(self, name):
         self.name = name
         self.transitions = {}
 
+        # NFA only: symbol -> list of next states, created on the first symbol transition
+        self.edges = None
+
 class Automaton:
+    # Set by freeze(), after which the automaton can be shared but not modified
+    frozen = False
+
+    # Counters collected by process_string while instrumentation is enabled, see enable_stats
+    stats = None
+
     def __init__(self):
         self.states = {}
         self.alphabet = set()
         self.start_state = None
         self.accept_states = set()
 
+        # How the automaton was built (source, size, seconds), filled by conversions and loaders
+        self.build_info = {}
+
     def print_fa(self):
         print("Alphabet:", self.alphabet)
         print("States:", list(self.states.keys()))
@@ -18,19 +40,13 @@ class Automaton:
         print("Transitions:")
         
         if isinstance(self, NFA):
+            # Edges are stored per symbol, so they print grouped by symbol with epsilon moves last
             for state, state_obj in self.states.items():
-                for symbol, transitions in state_obj.transitions.items():
-                    if symbol != "epsilon_transitions":
-                        if isinstance(transitions, list):
-                            for transition in transitions:
-                                input_symbol = transition.input_symbol if transition.input_symbol != "<EPSILON>" else "epsilon"
-                                print(f"From {state} to {transition.next_state} with symbol {input_symbol}")
-                        else:
-                            input_symbol = transitions.input_symbol if transitions.input_symbol != "<EPSILON>" else "epsilon"
-                            print(f"From {state} to {transitions.next_state} with symbol {input_symbol}")
-                    else:
-                        for next_state in transitions:
-                            print(f"From {state} to {next_state} with symbol epsilon")
+                for symbol, next_states in (state_obj.edges or {}).items():
+                    for next_state in next_states:
+                        print(f"From {state} to {next_state} with symbol {symbol}")
+                for next_state in state_obj.transitions.get("epsilon_transitions", ()):
+                    print(f"From {state} to {next_state} with symbol epsilon")
         else:
             for state, state_obj in self.states.items():
                 for symbol, next_states in state_obj.transitions.items():
@@ -41,21 +57,240 @@ class Automaton:
                         print(f"From {state} to {next_states} with symbol {symbol}")           
                         
     def add_state(self, name):
+        self._ensure_mutable()
         if name not in self.states:
             self.states[name] = State(name)
 
     def add_transition(self, current_state, input_symbol, next_state):
+        self._ensure_mutable()
         self.states[current_state].transitions[input_symbol] = next_state
         self.alphabet.add(input_symbol)
 
+    @classmethod
+    def from_edges(cls, states, edges, start_state=None, accept_states=(), alphabet=None):
+        # Build in one pass from iterables of state names and (state, symbol, next_state) edges
+        automaton = cls()
+        for state in states:
+            automaton.add_state(state)
+        automaton.add_edges(edges)
+        automaton.set_start_state(start_state)
+        automaton.set_accept_states(accept_states)
+        if alphabet is not None:
+            automaton.alphabet = set(alphabet)
+        return automaton
+
+    @classmethod
+    def from_columns(cls, states, sources, symbols, targets, start_state=None, accept_states=(), alphabet=None):
+        # Same as from_edges but with the edges given as three parallel columns
+        return cls.from_edges(states, zip(sources, symbols, targets), start_state, accept_states, alphabet)
+
+    def add_edges(self, edges):
+        self._ensure_mutable()
+        states = self.states
+        symbols = set()
+        for state, symbol, next_state in edges:
+            state_obj = states.get(state)
+            if state_obj is None:
+                state_obj = states[state] = State(state)
+            state_obj.transitions[symbol] = next_state
+            symbols.add(symbol)
+        self.alphabet |= symbols
+
     def set_start_state(self, start_state):
+        self._ensure_mutable()
         self.start_state = start_state
 
     def set_accept_states(self, accept_states):
+        self._ensure_mutable()
         self.accept_states = set(accept_states)
 
+    def enable_stats(self):
+        # Frozen automata are shared (see RegexCache), so they refuse counters every caller would see: thaw a copy first
+        if self.stats is None:
+            self.stats = Stats()
+        return self.stats
+
+    def disable_stats(self):
+        if self.stats is not None:
+            self.stats = None
+
+    def finditer(self, text, overlapping=False):
+        # (start, end) spans of the substrings of text accepted by the automaton, see search.Searcher
+        from search import Searcher
+        return Searcher(self).finditer(text, overlapping)
+
+    def search(self, text):
+        from search import Searcher
+        return Searcher(self).search(text)
+
+    def _ensure_mutable(self):
+        if self.frozen:
+            raise TypeError("Cannot modify a frozen automaton")
+
+    def __setattr__(self, name, value):
+        self._ensure_mutable()
+        super().__setattr__(name, value)
+
+    def freeze(self):
+        # Swap every container for a read-only one so a single instance can be shared between callers
+        for state_obj in self.states.values():
+            transitions = {}
+            for symbol, value in state_obj.transitions.items():
+                transitions[symbol] = tuple(value) if isinstance(value, list) else value
+            state_obj.transitions = MappingProxyType(transitions)
+            if state_obj.edges is not None:
+                state_obj.edges = MappingProxyType({symbol: tuple(next_states) for symbol, next_states in state_obj.edges.items()})
+
+        self.states = MappingProxyType(self.states)
+        self.alphabet = frozenset(self.alphabet)
+        self.accept_states = frozenset(self.accept_states)
+        self.build_info = MappingProxyType(dict(self.build_info))
+        super().__setattr__("frozen", True)
+        return self
+
+    def thaw(self):
+        # Mutable copy of the automaton, frozen or not
+        copy = type(self)()
+        for name, state_obj in self.states.items():
+            copied = State(name)
+            copied.transitions = {symbol: list(value) if isinstance(value, tuple) else value for symbol, value in state_obj.transitions.items()}
+            if state_obj.edges is not None:
+                copied.edges = {symbol: list(next_states) for symbol, next_states in state_obj.edges.items()}
+            copy.states[name] = copied
+        copy.alphabet = set(self.alphabet)
+        copy.start_state = self.start_state
+        copy.accept_states = set(self.accept_states)
+        copy.build_info = dict(self.build_info)
+        return copy
+
+    def __reduce_ex__(self, protocol):
+        # Read-only mappings cannot be pickled, so frozen automata travel as a mutable copy and are frozen again on load
+        if self.frozen:
+            return (type(self).freeze, (self.thaw(),))
+        return super().__reduce_ex__(protocol)
+
 class DFA(Automaton):
+    # Non-verbose inputs at least this long are processed in chunks across a process pool
+    parallel_threshold = PARALLEL_THRESHOLD
+
+    def compile(self):
+        # Freeze the DFA into integer ids and a flat transition table
+        return CompiledDFA.from_dfa(self)
+
+    def process_many(self, strings, reasons=False):
+        # Compile once and advance the whole batch through the table together
+        return self.compile().process_many(strings, reasons)
+
+    def process_parallel(self, input_string, workers=None, chunk_size=None):
+        # Split the input, map every chunk from every state in parallel, then compose the mappings in order
+        return process_parallel(self.compile(), input_string, workers, chunk_size)
+
+    def process_file(self, file_path):
+        # Scan the raw bytes of a memory-mapped file without decoding it
+        return self.compile().process_file(file_path)
+
+    def minimize(self):
+        started = time.perf_counter()
+        alphabet = sorted(self.alphabet)
+
+        # Keep only reachable states, remembering their original order for naming
+        order = {self.start_state: 0}
+        queue = [self.start_state]
+        for state in queue:
+            state_obj = self.states.get(state)
+            if state_obj is None:
+                continue
+            for symbol in alphabet:
+                next_state = state_obj.transitions.get(symbol)
+                if next_state is not None and next_state not in order:
+                    order[next_state] = len(order)
+                    queue.append(next_state)
+
+        # Complete the DFA with a dead state (None) and index transitions backwards
+        inverse = {symbol: {} for symbol in alphabet}
+        for state in list(order) + [None]:
+            state_obj = self.states.get(state) if state is not None else None
+            for symbol in alphabet:
+                next_state = state_obj.transitions.get(symbol) if state_obj is not None else None
+                inverse[symbol].setdefault(next_state, []).append(state)
+
+        # Hopcroft partition refinement, starting from accepting vs non-accepting states
+        accepting = [state for state in order if state in self.accept_states]
+        rejecting = [state for state in order if state not in self.accept_states] + [None]
+        blocks = [set(block) for block in (accepting, rejecting) if block]
+        block_of = {state: index for index, block in enumerate(blocks) for state in block}
+        worklist = {min(range(len(blocks)), key=lambda index: len(blocks[index]))}
+
+        while worklist:
+            splitter = list(blocks[worklist.pop()])
+            for symbol in alphabet:
+                touched = {}
+                for state in splitter:
+                    for previous in inverse[symbol].get(state, ()):
+                        touched.setdefault(block_of[previous], set()).add(previous)
+
+                for index, inside in touched.items():
+                    block = blocks[index]
+                    if len(inside) == len(block):
+                        continue
+
+                    # Split the block and queue the smaller half (or both, if the block was pending)
+                    block -= inside
+                    new_index = len(blocks)
+                    blocks.append(inside)
+                    for state in inside:
+                        block_of[state] = new_index
+                    if index in worklist or len(inside) <= len(block):
+                        worklist.add(new_index)
+                    else:
+                        worklist.add(index)
+
+        # Name each block after its first original state and drop the dead block
+        dead = block_of[None]
+        names = {}
+        for state in order:
+            if block_of[state] != dead or state == self.start_state:
+                names.setdefault(block_of[state], state)
+
+        dfa = DFA()
+        for name in names.values():
+            dfa.add_state(name)
+        for index, name in names.items():
+            state_obj = self.states.get(name)
+            if state_obj is None:
+                continue
+            for symbol in alphabet:
+                next_state = state_obj.transitions.get(symbol)
+                if next_state is not None and block_of[next_state] != dead:
+                    dfa.add_transition(name, symbol, names[block_of[next_state]])
+
+        dfa.set_start_state(self.start_state)
+        dfa.set_accept_states(name for name in names.values() if name in self.accept_states)
+        dfa.alphabet = set(self.alphabet)
+        dfa.build_info = {"source": "hopcroft minimization", "states": len(dfa.states), "seconds": time.perf_counter() - started}
+        return dfa
+
+    def start(self):
+        return DFASession(self)
+
+    def iter_steps(self, input_string):
+        # Yield each step lazily, stopping where process_string would reject
+        current_state = self.start_state
+        for symbol in input_string:
+            if symbol not in self.alphabet:
+                return
+            next_state = self.states[current_state].transitions.get(symbol)
+            if next_state is None:
+                return
+            yield current_state, symbol, next_state
+            current_state = next_state
+
     def process_string(self, input_string, verbose = False):
+        if self.stats is not None and not verbose:
+            return self._process_counted(input_string)
+        if not verbose and len(input_string) >= self.parallel_threshold and parallel_available():
+            return self.process_parallel(input_string)
+
         current_state = self.start_state
 
         # Track the path for verbose mode
@@ -76,8 +311,8 @@ class DFA(Automaton):
                 else:
                     return "REJECT", f"No transition for '{symbol}' in state '{current_state}'"
 
-
-            path.append((current_state, symbol, next_state))
+            if verbose:
+                path.append((current_state, symbol, next_state))
             current_state = next_state
 
         # Check if current state is final state and finish process
@@ -92,13 +327,53 @@ class DFA(Automaton):
             else:
                 return "REJECT", "String rejected"
 
+    def _process_counted(self, input_string):
+        # Same walk as process_string, updating self.stats as it goes
+        stats = self.stats
+        started = time.perf_counter()
+        stats.calls += 1
+        stats.peak_active = max(stats.peak_active, 1)
+
+        current_state = self.start_state
+        outcome = None
+        for symbol in input_string:
+            stats.symbols += 1
+            if symbol not in self.alphabet:
+                outcome = "REJECT", f"Invalid symbol '{symbol}'"
+                break
+            next_state = self.states[current_state].transitions.get(symbol)
+            if next_state is None:
+                outcome = "REJECT", f"No transition for '{symbol}' in state '{current_state}'"
+                break
+            stats.transitions += 1
+            current_state = next_state
+
+        if outcome is not None:
+            stats.dead_ends += 1
+        elif current_state in self.accept_states:
+            outcome = "ACCEPT", "String accepted"
+        else:
+            outcome = "REJECT", "String rejected"
+        stats.seconds += time.perf_counter() - started
+        return outcome
+
 
 class NFA(Automaton):
     def __init__(self):
         super().__init__()
 
+        # Epsilon-closure of every state, filled on demand and dropped when an epsilon edge is added
+        self._closures = {}
+
+        # Optional on-the-fly DFA cache used by non-verbose process_string
+        self.lazy_dfa = None
+
+    def use_lazy_dfa(self, max_states=1024, min_progress=10):
+        self.lazy_dfa = LazyDFA(self, max_states, min_progress)
+        return self.lazy_dfa
+
     def add_transition(self, current_state, input_symbol, next_state):
-        transition = NFATransition(current_state, input_symbol, next_state)
+        self._ensure_mutable()
         if current_state not in self.states:
             self.states[current_state] = State(current_state)
 
@@ -106,77 +381,483 @@ class NFA(Automaton):
             if "epsilon_transitions" not in self.states[current_state].transitions:
                 self.states[current_state].transitions["epsilon_transitions"] = []
             self.states[current_state].transitions["epsilon_transitions"].append(next_state)
+            self._closures = {}
         else:
-            if "transitions" not in self.states[current_state].transitions:
-                self.states[current_state].transitions["transitions"] = []
-            self.states[current_state].transitions["transitions"].append(transition)
+            state_obj = self.states[current_state]
+            if state_obj.edges is None:
+                state_obj.edges = {}
+
+            # Edges are only stored indexed by symbol, so simulation does not scan every outgoing transition
+            if input_symbol in state_obj.edges:
+                state_obj.edges[input_symbol].append(next_state)
+            else:
+                state_obj.edges[input_symbol] = [next_state]
         
         self.alphabet.add(input_symbol)
 
-    def process_string(self, input_string, current_state, verbose=False, path=None):
+        if self.lazy_dfa is not None:
+            self.lazy_dfa.flush()
+
+    def start(self, current_state=None):
+        return NFASession(self, self.start_state if current_state is None else current_state)
+
+    def add_edges(self, edges):
+        self._ensure_mutable()
+        states = self.states
+        symbols = set()
+        for state, symbol, next_state in edges:
+            state_obj = states.get(state)
+            if state_obj is None:
+                state_obj = states[state] = State(state)
+
+            if symbol == "<EPSILON>":
+                state_obj.transitions.setdefault("epsilon_transitions", []).append(next_state)
+            else:
+                if state_obj.edges is None:
+                    state_obj.edges = {}
+                if symbol in state_obj.edges:
+                    state_obj.edges[symbol].append(next_state)
+                else:
+                    state_obj.edges[symbol] = [next_state]
+            symbols.add(symbol)
+
+        self.alphabet |= symbols
+        self._closures = {}
+        if self.lazy_dfa is not None:
+            self.lazy_dfa.flush()
+
+    def process_string(self, input_string, current_state=None, verbose=False, path=None):
+        if current_state is None:
+            current_state = self.start_state
+
         # Track the path for verbose mode
         if path is None:
             path = []
 
-        if not input_string:
-            if current_state in self.accept_states:
-                if verbose:
-                    return "ACCEPT", "String accepted", path
-                else:
-                    return "ACCEPT", "String accepted"
+        if input_string and current_state not in self.states:
+            if verbose:
+                return "REJECT", f"Invalid state '{current_state}'", path
             else:
-                if verbose:
-                    return "REJECT", "String rejected", path
-                else:
-                    return "REJECT", "String rejected"
+                return "REJECT", f"Invalid state '{current_state}'"
 
-        symbol = input_string[0]
-        remaining_input = input_string[1:]
+        if verbose:
+            result, message, steps = self.trace(input_string, current_state)
+            return result, message, path + list(steps)
+        if self.stats is not None:
+            if self._accepts_counted(input_string, current_state):
+                return "ACCEPT", "String accepted"
+        elif self.lazy_dfa is not None:
+            if self.lazy_dfa.accepts(input_string, current_state):
+                return "ACCEPT", "String accepted"
+        elif self._process_set(input_string, self.epsilon_closure(current_state)):
+            return "ACCEPT", "String accepted"
 
-        if current_state not in self.states:
-            return "REJECT", f"Invalid state '{current_state}'"
+        if not input_string:
+            return "REJECT", "String rejected"
+        return "REJECT", f"No transition for '{input_string[0]}' in state '{current_state}'"
 
-        transitions = self.states[current_state].transitions.get("transitions", [])
-        epsilon_transitions = self.states[current_state].transitions.get("epsilon_transitions", [])
+    def _process_set(self, symbols, active):
+        # Advance the whole set of active states one symbol at a time
+        for symbol in symbols:
+            active = self._step(active, symbol)
+            if not active:
+                return False
 
-        final_path = []  # initialize final_path variable
+        return not self.accept_states.isdisjoint(active)
 
-        for transition in transitions:
-                if transition.input_symbol == symbol:
-                    if verbose: 
-                        new_path = path + [(current_state, symbol, transition.next_state)]
-                        result, message, final_path = self.process_string(remaining_input, transition.next_state, verbose, new_path)
-                        if result == "ACCEPT":
-                            return result, message, final_path
-                    else:
-                        new_path = path + [(current_state, symbol, transition.next_state)]
-                        result, message = self.process_string(remaining_input, transition.next_state)
-                        if result == "ACCEPT":
-                            return result, message
+    def _accepts_counted(self, input_string, current_state):
+        # Same simulation as the non-verbose paths, updating self.stats as it goes
+        stats = self.stats
+        started = time.perf_counter()
+        stats.calls += 1
+        try:
+            if self.lazy_dfa is not None:
+                # The lazy DFA keeps its own counters, every symbol it reads is either a hit or a miss
+                lazy_dfa = self.lazy_dfa
+                hits, misses = lazy_dfa.hits, lazy_dfa.misses
+                accepted = lazy_dfa.accepts(input_string, current_state)
+                stats.cache_hits += lazy_dfa.hits - hits
+                stats.cache_misses += lazy_dfa.misses - misses
+                stats.symbols += lazy_dfa.hits - hits + lazy_dfa.misses - misses
+                return accepted
 
-        for next_state in epsilon_transitions:
-            if verbose:
-                if (next_state, "<EPSILON>", next_state) in path:
-                    continue  # Avoid infinite loop
-                new_path = path + [(current_state, "<EPSILON>", next_state)]
-                result, message, final_path = self.process_string(input_string, next_state, verbose, new_path)
-                if result == "ACCEPT":
-                    return result, message, final_path
-            else:
-                if (next_state, "<EPSILON>", next_state) in path:
-                    continue  # Avoid infinite loop
-                new_path = path + [(current_state, "<EPSILON>", next_state)]
-                result, message = self.process_string(input_string, next_state, verbose, new_path)
-                if result == "ACCEPT":
-                    return result, message
+            active = self._closure_counted(current_state, stats)
+            stats.peak_active = max(stats.peak_active, len(active))
+            for symbol in input_string:
+                stats.symbols += 1
+                next_active = set()
+                for state in active:
+                    state_obj = self.states.get(state)
+                    next_states = state_obj.edges.get(symbol, ()) if state_obj is not None and state_obj.edges is not None else ()
+                    if not next_states:
+                        stats.dead_ends += 1
+                    for next_state in next_states:
+                        stats.transitions += 1
+                        next_active.update(self._closure_counted(next_state, stats))
 
-        if verbose:
-            return "REJECT", f"No transition for '{symbol}' in state '{current_state}'", path
+                active = next_active
+                stats.peak_active = max(stats.peak_active, len(active))
+                if not active:
+                    return False
+            return not self.accept_states.isdisjoint(active)
+        finally:
+            stats.seconds += time.perf_counter() - started
+
+    def _closure_counted(self, state, stats):
+        # Hits and misses of the epsilon-closure cache, expansions are the states reached through epsilon edges
+        closure = self._closures.get(state)
+        if closure is None:
+            stats.cache_misses += 1
+            closure = self.epsilon_closure(state)
         else:
-            return "REJECT", f"No transition for '{symbol}' in state '{current_state}'"
+            stats.cache_hits += 1
+        stats.epsilon_expansions += len(closure) - 1
+        return closure
+
+    def _step(self, active, symbol):
+        next_active = set()
+        for state in active:
+            state_obj = self.states.get(state)
+            if state_obj is None or state_obj.edges is None:
+                continue
+            for next_state in state_obj.edges.get(symbol, ()):
+                next_active.update(self.epsilon_closure(next_state))
+        return next_active
+
+    def _process_traced(self, input_string, current_state):
+        # Every active state maps to the step that first reached it, so a path can be rebuilt on accept
+        active = self._epsilon_closure({current_state: None}, True)
+
+        for symbol in input_string:
+            next_active = {}
+            for state, trace in active.items():
+                state_obj = self.states.get(state)
+                if state_obj is None or state_obj.edges is None:
+                    continue
+                for next_state in state_obj.edges.get(symbol, ()):
+                    if next_state not in next_active:
+                        next_active[next_state] = (state, symbol, next_state, trace)
+
+            if not next_active:
+                return False, None
+            active = self._epsilon_closure(next_active, True)
+
+        for state, trace in active.items():
+            if state in self.accept_states:
+                return True, trace
+        return False, None
+
+    def epsilon_closure(self, state):
+        closure = self._closures.get(state)
+        if closure is None:
+            closure = frozenset(self._epsilon_closure({state: None}))
+            self._closures[state] = closure
+        return closure
+
+    def remove_epsilons(self):
+        # Build an equivalent NFA where every epsilon path is folded into the symbol transitions
+        nfa = NFA()
+        for state in self.states:
+            nfa.add_state(state)
+
+        accept_states = set(self.accept_states)
+        for state in self.states:
+            closure = self.epsilon_closure(state)
+            if not self.accept_states.isdisjoint(closure):
+                accept_states.add(state)
+
+            added = set()
+            for reachable in closure:
+                reachable_obj = self.states.get(reachable)
+                if reachable_obj is None or reachable_obj.edges is None:
+                    continue
+                for symbol, next_states in reachable_obj.edges.items():
+                    for next_state in next_states:
+                        if (symbol, next_state) not in added:
+                            added.add((symbol, next_state))
+                            nfa.add_transition(state, symbol, next_state)
+
+        nfa.set_start_state(self.start_state)
+        nfa.set_accept_states(accept_states)
+        nfa.alphabet |= self.alphabet - {"<EPSILON>"}
+        return nfa
+
+    def to_dfa(self, max_states=None):
+        started = time.perf_counter()
+        dfa = DFA()
+
+        # Intern every reachable set of NFA states under a dense id
+        start = self.epsilon_closure(self.start_state)
+        ids = {start: 0}
+        subsets = [start]
+        dfa.add_state("q0")
+        dfa.set_start_state("q0")
+
+        for subset in subsets:
+            moves = {}
+            for state in subset:
+                state_obj = self.states.get(state)
+                if state_obj is None or state_obj.edges is None:
+                    continue
+                for symbol, next_states in state_obj.edges.items():
+                    targets = moves.setdefault(symbol, set())
+                    for next_state in next_states:
+                        targets.update(self.epsilon_closure(next_state))
+
+            for symbol in sorted(moves):
+                target = frozenset(moves[symbol])
+                if target not in ids:
+                    if max_states is not None and len(ids) >= max_states:
+                        raise ValueError(f"Subset construction exceeded {max_states} states")
+                    ids[target] = len(ids)
+                    subsets.append(target)
+                    dfa.add_state(f"q{ids[target]}")
+                dfa.add_transition(f"q{ids[subset]}", symbol, f"q{ids[target]}")
+
+        dfa.set_accept_states(f"q{index}" for subset, index in ids.items() if not self.accept_states.isdisjoint(subset))
+        dfa.alphabet |= self.alphabet - {"<EPSILON>"}
+        dfa.build_info = {"source": "subset construction", "states": len(ids), "seconds": time.perf_counter() - started}
+        return dfa
+
+    def _epsilon_closure(self, active, verbose=False):
+        # Follow epsilon transitions until no new state is reached, keeping the first step into each state
+        stack = list(active)
+        while stack:
+            state = stack.pop()
+            state_obj = self.states.get(state)
+            if state_obj is None:
+                continue
+            trace = active[state]
+            for next_state in state_obj.transitions.get("epsilon_transitions", []):
+                if next_state not in active:
+                    active[next_state] = (state, "<EPSILON>", next_state, trace) if verbose else None
+                    stack.append(next_state)
+        return active
+
+    def trace(self, input_string, current_state=None):
+        # One traced run: result, message and an iterator over the steps of an accepting path,
+        # rebuilt from the back-pointers only once the input is accepted
+        if current_state is None:
+            current_state = self.start_state
+        if input_string and current_state not in self.states:
+            return "REJECT", f"Invalid state '{current_state}'", iter(())
+
+        accepted, trace = self._process_traced(input_string, current_state)
+        if accepted:
+            return "ACCEPT", "String accepted", self._unwind(trace)
+        if not input_string:
+            return "REJECT", "String rejected", iter(())
+        return "REJECT", f"No transition for '{input_string[0]}' in state '{current_state}'", iter(())
+
+    def iter_steps(self, input_string, current_state=None):
+        yield from self.trace(input_string, current_state)[2]
+
+    def _unwind(self, trace):
+        # Trace nodes are (state, symbol, next_state, previous node), newest first. To walk them forwards
+        # every step-th node is kept as a checkpoint and one segment at a time is expanded, so only about
+        # the square root of the path length is held on top of the trace itself.
+        length = 0
+        node = trace
+        while node is not None:
+            length += 1
+            node = node[3]
+
+        step = max(1, isqrt(length))
+        checkpoints = []
+        node = trace
+        for index in range(length):
+            if index % step == 0:
+                checkpoints.append(node)
+            node = node[3]
+
+        stop = None
+        for checkpoint in reversed(checkpoints):
+            segment = []
+            node = checkpoint
+            while node is not stop:
+                segment.append(node)
+                node = node[3]
+            stop = checkpoint
+            for node in reversed(segment):
+                yield node[:3]
+
+class DFASession:
+    def __init__(self, dfa):
+        self.dfa = dfa
+        self.current_state = dfa.start_state
+        self.consumed = 0
+
+        # Reject message once the input can no longer be accepted
+        self.failure = None
+
+    @property
+    def dead(self):
+        return self.failure is not None
+
+    def feed(self, chunk):
+        if self.failure is not None:
+            return False
+
+        states = self.dfa.states
+        alphabet = self.dfa.alphabet
+        current_state = self.current_state
+        for symbol in chunk:
+            if symbol not in alphabet:
+                self.failure = f"Invalid symbol '{symbol}'"
+                break
+
+            next_state = states[current_state].transitions.get(symbol)
+            if next_state is None:
+                self.failure = f"No transition for '{symbol}' in state '{current_state}'"
+                break
+
+            current_state = next_state
+            self.consumed += 1
+
+        self.current_state = current_state
+        return self.failure is None
+
+    def consume(self, chunks):
+        # Feed an iterable of chunks, stopping as soon as the stream goes dead
+        for chunk in chunks:
+            if not self.feed(chunk):
+                break
+        return self.result()
+
+    def result(self):
+        if self.failure is not None:
+            return "REJECT", self.failure
+        if self.current_state in self.dfa.accept_states:
+            return "ACCEPT", "String accepted"
+        return "REJECT", "String rejected"
+
+
+class NFASession:
+    def __init__(self, nfa, current_state):
+        self.nfa = nfa
+        self.start_state = current_state
+        self.active = nfa.epsilon_closure(current_state)
+        self.consumed = 0
+
+        # First symbol of the stream, which the NFA reject message refers to
+        self.first_symbol = None
+
+    @property
+    def dead(self):
+        return not self.active
+
+    def feed(self, chunk):
+        if not self.active:
+            return False
+
+        if self.first_symbol is None and chunk:
+            self.first_symbol = chunk[0]
+            if self.start_state not in self.nfa.states:
+                self.active = frozenset()
+                return False
+
+        active = self.active
+        for symbol in chunk:
+            active = self.nfa._step(active, symbol)
+            if not active:
+                break
+            self.consumed += 1
+
+        self.active = active
+        return bool(active)
+
+    def consume(self, chunks):
+        # Feed an iterable of chunks, stopping as soon as the stream goes dead
+        for chunk in chunks:
+            if not self.feed(chunk):
+                break
+        return self.result()
+
+    def result(self):
+        if self.first_symbol is None:
+            if self.nfa.accept_states.isdisjoint(self.active):
+                return "REJECT", "String rejected"
+            return "ACCEPT", "String accepted"
+        if self.start_state not in self.nfa.states:
+            return "REJECT", f"Invalid state '{self.start_state}'"
+        if self.nfa.accept_states.isdisjoint(self.active):
+            return "REJECT", f"No transition for '{self.first_symbol}' in state '{self.start_state}'"
+        return "ACCEPT", "String accepted"
+
+
+class LazyDFA:
+    def __init__(self, nfa, max_states=1024, min_progress=10):
+        self.nfa = nfa
+        self.max_states = max_states
+
+        # A flush that comes sooner than min_progress symbols per cached state means the cache is thrashing
+        self.min_progress = min_progress
+
+        # Each DFA state is a frozenset of NFA states whose row maps symbol -> (next set, next row)
+        self.rows = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+        self.fallbacks = 0
+
+        # Symbols run since the last flush, across calls, so many short strings still count as progress
+        self.progress = 0
+
+    def accepts(self, input_string, current_state):
+        active = self.nfa.epsilon_closure(current_state)
+        row = self._row(active)
+        progress = self.progress
+
+        symbols = iter(input_string)
+        for symbol in symbols:
+            cached = row.get(symbol)
+            if cached is not None:
+                self.hits += 1
+                active, row = cached
+            else:
+                self.misses += 1
+                next_active = frozenset(self.nfa._step(active, symbol))
+
+                if next_active not in self.rows and len(self.rows) >= self.max_states:
+                    thrashing = progress < self.min_progress * self.max_states
+                    self.flush()
+                    progress = 0
+                    if thrashing:
+                        # Finish the input with plain set simulation instead of rebuilding the cache
+                        self.fallbacks += 1
+                        return bool(next_active) and self.nfa._process_set(symbols, next_active)
+                    row = self._row(active)
+
+                next_row = self._row(next_active)
+                row[symbol] = (next_active, next_row)
+                active, row = next_active, next_row
+
+            progress += 1
+            if not active:
+                break
+
+        self.progress = progress
+        return bool(active) and not self.nfa.accept_states.isdisjoint(active)
+
+    def _row(self, active):
+        row = self.rows.get(active)
+        if row is None:
+            row = self.rows[active] = {}
+        return row
+
+    def flush(self):
+        if self.rows:
+            self.flushes += 1
+        self.rows = {}
+        self.progress = 0
 
-class NFATransition:
-    def __init__(self, state, input_symbol, next_state):
-        self.state = state
-        self.input_symbol = input_symbol
-        self.next_state = next_state
\ No newline at end of file
+    def cache_info(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "flushes": self.flushes,
+            "fallbacks": self.fallbacks,
+            "states": len(self.rows),
+            "max_states": self.max_states
+        }
@@ -0,0 +1,372 @@
+import json
+import mmap
+import struct
+import sys
+import time
+from array import array
+from functools import cached_property
+from itertools import islice
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Table entry for a missing transition
+DEAD = -1
+
+# Byte symbol id for a byte that is not in the alphabet
+INVALID = -2
+
+# Binary format: magic, version, state count, symbol count, start state, name blob size, symbol blob size.
+# The header is followed by the int32 transition table, the accept bitmap, the name offsets (uint32, one
+# more than the state count), the UTF-8 name blob and the JSON symbol list, all little-endian.
+MAGIC = b"FADFA\0\0\0"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIIIIQQ")
+
+class NameTable:
+    # Read-only sequence of state names decoded on demand from a UTF-8 blob
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return str(self.blob[self.offsets[index]:self.offsets[index + 1]], "utf-8")
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+class AcceptBitmap:
+    # One bit per state, least significant bit first
+    def __init__(self, bits, size):
+        self.bits = bits
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        return (self.bits[index >> 3] >> (index & 7)) & 1
+
+class CompiledDFA:
+    def __init__(self, state_names, symbols, table, accepting, start):
+        self.state_names = state_names
+        self.symbols = symbols
+        self.symbol_ids = {symbol: index for index, symbol in enumerate(symbols)}
+        self.num_symbols = len(symbols)
+
+        # Row-major table: table[state * num_symbols + symbol] is the next state id or DEAD
+        self.table = table
+        self.accepting = accepting
+        self.start = start
+
+        # File the tables are memory-mapped from, if any
+        self.source = None
+
+    @cached_property
+    def state_ids(self):
+        return {name: index for index, name in enumerate(self.state_names)}
+
+    def __reduce_ex__(self, protocol):
+        # Memory-mapped tables are reopened from their file instead of being copied into the pickle
+        if self.source is not None:
+            return CompiledDFA.load, (self.source,)
+        return super().__reduce_ex__(protocol)
+
+    def save(self, file_path):
+        names = [str(name).encode("utf-8") for name in self.state_names]
+        offsets = array("I", [0])
+        for name in names:
+            offsets.append(offsets[-1] + len(name))
+        name_blob = b"".join(names)
+        symbol_blob = json.dumps(self.symbols).encode("utf-8")
+
+        bits = bytearray((len(self.state_names) + 7) // 8)
+        for state in range(len(self.state_names)):
+            if self.accepting[state]:
+                bits[state >> 3] |= 1 << (state & 7)
+
+        table = array("i", self.table)
+        if sys.byteorder == "big":
+            table.byteswap()
+            offsets.byteswap()
+
+        with open(file_path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(self.state_names), self.num_symbols, self.start, len(name_blob), len(symbol_blob)))
+            file.write(table.tobytes())
+            file.write(bits)
+            file.write(offsets.tobytes())
+            file.write(name_blob)
+            file.write(symbol_blob)
+
+    @classmethod
+    def load(cls, file_path):
+        with open(file_path, "rb") as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(data) < HEADER.size:
+            raise ValueError(f"'{file_path}' is not a compiled automaton")
+        magic, version, num_states, num_symbols, start, names_size, symbols_size = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f"'{file_path}' is not a compiled automaton")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled automaton version {version}")
+
+        # Slice the mapping into zero-copy views over each section
+        view = memoryview(data)
+        position = HEADER.size
+        table_end = position + 4 * num_states * num_symbols
+        bits_end = table_end + (num_states + 7) // 8
+        offsets_end = bits_end + 4 * (num_states + 1)
+        names_end = offsets_end + names_size
+        if len(data) != names_end + symbols_size:
+            raise ValueError(f"'{file_path}' is truncated or does not match its header")
+
+        table = view[position:table_end].cast("i")
+        offsets = view[bits_end:offsets_end].cast("I")
+        if sys.byteorder == "big":
+            table = array("i", table)
+            table.byteswap()
+            offsets = array("I", offsets)
+            offsets.byteswap()
+
+        state_names = NameTable(offsets, view[offsets_end:names_end])
+        symbols = json.loads(bytes(view[names_end:names_end + symbols_size]))
+        compiled = cls(state_names, symbols, table, AcceptBitmap(view[table_end:bits_end], num_states), start)
+        compiled.source = file_path
+        return compiled
+
+    @classmethod
+    def from_dfa(cls, dfa):
+        # Dense ids for every state, including targets that were never added explicitly
+        state_names = list(dfa.states)
+        state_ids = {name: index for index, name in enumerate(state_names)}
+        for state_obj in dfa.states.values():
+            for next_state in state_obj.transitions.values():
+                if next_state not in state_ids:
+                    state_ids[next_state] = len(state_names)
+                    state_names.append(next_state)
+        if dfa.start_state not in state_ids:
+            state_ids[dfa.start_state] = len(state_names)
+            state_names.append(dfa.start_state)
+
+        # Only alphabet symbols get a column, anything else is an invalid symbol
+        symbols = sorted(dfa.alphabet)
+        symbol_ids = {symbol: index for index, symbol in enumerate(symbols)}
+
+        table = array("i", [DEAD]) * (len(state_names) * len(symbols))
+        for state, state_obj in dfa.states.items():
+            row = state_ids[state] * len(symbols)
+            for symbol, next_state in state_obj.transitions.items():
+                if symbol in symbol_ids:
+                    table[row + symbol_ids[symbol]] = state_ids[next_state]
+
+        accepting = bytearray(len(state_names))
+        for state in dfa.accept_states:
+            if state in state_ids:
+                accepting[state_ids[state]] = 1
+
+        return cls(state_names, symbols, table, accepting, state_ids[dfa.start_state])
+
+    def process_string(self, input_string, verbose=False):
+        if verbose:
+            return self._process_verbose(input_string)
+
+        symbol_ids = self.symbol_ids
+        table = self.table
+        num_symbols = self.num_symbols
+        current_state = self.start
+
+        for symbol in input_string:
+            symbol_id = symbol_ids.get(symbol)
+            if symbol_id is None:
+                return "REJECT", f"Invalid symbol '{symbol}'"
+
+            next_state = table[current_state * num_symbols + symbol_id]
+            if next_state == DEAD:
+                return "REJECT", f"No transition for '{symbol}' in state '{self.state_names[current_state]}'"
+            current_state = next_state
+
+        if self.accepting[current_state]:
+            return "ACCEPT", "String accepted"
+        return "REJECT", "String rejected"
+
+    def _process_verbose(self, input_string):
+        names = self.state_names
+        current_state = self.start
+
+        # Track the path for verbose mode
+        path = []
+
+        for symbol in input_string:
+            symbol_id = self.symbol_ids.get(symbol)
+            if symbol_id is None:
+                return "REJECT", f"Invalid symbol '{symbol}'", path
+
+            next_state = self.table[current_state * self.num_symbols + symbol_id]
+            if next_state == DEAD:
+                return "REJECT", f"No transition for '{symbol}' in state '{names[current_state]}'", path
+
+            path.append((names[current_state], symbol, names[next_state]))
+            current_state = next_state
+
+        if self.accepting[current_state]:
+            return "ACCEPT", "String accepted", path
+        return "REJECT", "String rejected", path
+
+    def process_many(self, strings, reasons=False, batch_size=65536):
+        strings = iter(strings)
+        accepted = []
+        messages = []
+
+        while True:
+            batch = list(islice(strings, batch_size))
+            if not batch:
+                break
+
+            if np is None:
+                # Without NumPy fall back to one table walk per string
+                results = [self.process_string(string) for string in batch]
+                accepted.extend(result == "ACCEPT" for result, _ in results)
+                if reasons:
+                    messages.extend(message for _, message in results)
+            else:
+                batch_accepted, batch_messages = self._process_batch(batch, reasons)
+                accepted.append(batch_accepted)
+                if reasons:
+                    messages.extend(batch_messages)
+
+        if np is not None:
+            accepted = np.concatenate(accepted) if accepted else np.zeros(0, dtype=bool)
+        if reasons:
+            return accepted, messages
+        return accepted
+
+    @cached_property
+    def _batch_tables(self):
+        # Extended table with two extra rows (dead, invalid) and two extra columns (invalid symbol, padding)
+        num_states = len(self.state_names)
+        num_symbols = self.num_symbols
+        dead = num_states
+        invalid = num_states + 1
+
+        table = np.full((num_states + 2, num_symbols + 2), dead, dtype=np.int32)
+        if num_symbols:
+            core = np.frombuffer(self.table, dtype=np.int32).reshape(num_states, num_symbols)
+            table[:num_states, :num_symbols] = np.where(core == DEAD, dead, core)
+        table[:, num_symbols] = invalid
+        table[:, num_symbols + 1] = np.arange(num_states + 2)
+        table[dead, :] = dead
+        table[invalid, :] = invalid
+
+        accepting = np.zeros(num_states + 2, dtype=bool)
+        accepting[:num_states] = np.fromiter((self.accepting[state] for state in range(num_states)), dtype=bool, count=num_states)
+
+        return table.ravel(), accepting
+
+    def _process_batch(self, batch, reasons):
+        table, accepting = self._batch_tables
+        num_states = len(self.state_names)
+        width = self.num_symbols + 2
+        invalid_column = self.num_symbols
+        padding_column = self.num_symbols + 1
+
+        # Map every code point in the batch to a symbol id, unknown characters go to the invalid column
+        lengths = np.fromiter((len(string) for string in batch), dtype=np.int64, count=len(batch))
+        longest = int(lengths.max())
+        text = "".join(batch)
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+
+        lookup_size = int(codes.max()) + 1 if len(codes) else 1
+        lookup = np.full(lookup_size, invalid_column, dtype=np.int32)
+        for symbol, symbol_id in self.symbol_ids.items():
+            if len(symbol) == 1 and ord(symbol) < lookup_size:
+                lookup[ord(symbol)] = symbol_id
+
+        # Padded matrix with one row per string, short rows padded with a column that keeps the state
+        matrix = np.full((len(batch), longest), padding_column, dtype=np.int32)
+        matrix[np.arange(longest) < lengths[:, None]] = lookup[codes]
+
+        current = np.full(len(batch), self.start, dtype=np.int32)
+        if reasons:
+            failed_at = np.full(len(batch), -1, dtype=np.int64)
+            failed_in = np.zeros(len(batch), dtype=np.int32)
+
+        for column in range(longest):
+            following = table[current * width + matrix[:, column]]
+            if reasons:
+                newly_failed = (following >= num_states) & (current < num_states)
+                failed_at[newly_failed] = column
+                failed_in[newly_failed] = current[newly_failed]
+            current = following
+
+        accepted = accepting[current]
+        if not reasons:
+            return accepted, None
+
+        messages = []
+        for index, string in enumerate(batch):
+            state = current[index]
+            if state == num_states + 1:
+                messages.append(f"Invalid symbol '{string[failed_at[index]]}'")
+            elif state == num_states:
+                messages.append(f"No transition for '{string[failed_at[index]]}' in state '{self.state_names[failed_in[index]]}'")
+            elif accepted[index]:
+                messages.append("String accepted")
+            else:
+                messages.append("String rejected")
+        return accepted, messages
+
+    @cached_property
+    def byte_symbols(self):
+        # Symbol id of every byte read as the latin-1 character with the same value, INVALID outside the alphabet
+        return array("i", (self.symbol_ids.get(chr(byte), INVALID) for byte in range(256)))
+
+    def process_file(self, file_path):
+        byte_symbols = self.byte_symbols
+        table = self.table
+        num_symbols = self.num_symbols
+        started = time.perf_counter()
+        current_state = self.start
+        offset = None
+        size = 0
+
+        with open(file_path, "rb") as file:
+            # Empty files cannot be memory-mapped
+            if file.seek(0, 2):
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    size = len(data)
+                    with memoryview(data) as view:
+                        for offset, byte in enumerate(view):
+                            symbol_id = byte_symbols[byte]
+                            if symbol_id < 0:
+                                next_state = INVALID
+                                break
+                            next_state = table[current_state * num_symbols + symbol_id]
+                            if next_state < 0:
+                                break
+                            current_state = next_state
+                        else:
+                            offset = None
+                    if offset is not None:
+                        byte = data[offset]
+
+        seconds = time.perf_counter() - started
+        report = {
+            "bytes": size,
+            "offset": offset,
+            "seconds": seconds,
+            "bytes_per_second": size / seconds if seconds else 0.0
+        }
+
+        if offset is not None:
+            if next_state == INVALID:
+                return "REJECT", f"Invalid symbol '{chr(byte)}'", report
+            return "REJECT", f"No transition for '{chr(byte)}' in state '{self.state_names[current_state]}'", report
+        if self.accepting[current_state]:
+            return "ACCEPT", "String accepted", report
+        return "REJECT", "String rejected", report
@@ -0,0 +1,104 @@
+import json
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from automaton import DFA
+
+# Automaton shared with every worker through the pool initializer
+_worker_automaton = None
+
+def _init_worker(automaton):
+    global _worker_automaton
+    _worker_automaton = automaton
+
+def _process_batch(lines, automaton=None):
+    if automaton is None:
+        automaton = _worker_automaton
+    results = []
+    for line in lines:
+        started = time.perf_counter()
+        result, message = automaton.process_string(line)
+        results.append((result, message, time.perf_counter() - started))
+    return results
+
+class LatencyHistogram:
+    # Log-scaled buckets keep percentiles within ~5% using constant memory
+    growth = 1.05
+    floor = 1e-9
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+
+    def add(self, seconds):
+        bucket = int(math.log(max(seconds, self.floor) / self.floor, self.growth))
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+
+    def percentile(self, percent):
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return self.floor * self.growth ** (bucket + 1)
+        return 0.0
+
+def read_lines(corpus_path):
+    with open(corpus_path, encoding="utf-8") as corpus:
+        for line in corpus:
+            yield line.rstrip("\r\n")
+
+def write_result(output, output_format, number, line, result, message):
+    if output_format == "tsv":
+        output.write(f"{number}\t{line}\t{result}\t{message}\n")
+    else:
+        output.write(json.dumps({"line": number, "input": line, "result": result, "message": message}) + "\n")
+
+def process_corpus(automaton, corpus_path, output, workers=None, output_format="ndjson", batch_size=1000):
+    workers = workers or os.cpu_count() or 1
+
+    # DFAs are shipped to the workers in their compiled form
+    if isinstance(automaton, DFA):
+        automaton = automaton.compile()
+
+    lines = read_lines(corpus_path)
+    histogram = LatencyHistogram()
+    summary = {"strings": 0, "accepted": 0, "rejected": 0}
+    started = time.perf_counter()
+
+    def write_batch(batch, results):
+        for line, (result, message, seconds) in zip(batch, results):
+            summary["strings"] += 1
+            summary["accepted" if result == "ACCEPT" else "rejected"] += 1
+            histogram.add(seconds)
+            write_result(output, output_format, summary["strings"], line, result, message)
+
+    if workers == 1:
+        while batch := list(islice(lines, batch_size)):
+            write_batch(batch, _process_batch(batch, automaton))
+    else:
+        # Keep a bounded window of batches in flight and write them back in submission order
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(automaton,)) as pool:
+            pending = deque()
+            while batch := list(islice(lines, batch_size)):
+                pending.append((batch, pool.submit(_process_batch, batch)))
+                if len(pending) >= workers * 2:
+                    batch, future = pending.popleft()
+                    write_batch(batch, future.result())
+            while pending:
+                batch, future = pending.popleft()
+                write_batch(batch, future.result())
+
+    seconds = time.perf_counter() - started
+    summary["seconds"] = seconds
+    summary["strings_per_second"] = summary["strings"] / seconds if seconds else 0.0
+    summary["p50"] = histogram.percentile(50)
+    summary["p99"] = histogram.percentile(99)
+    return summary
@@ -0,0 +1,237 @@
+import json
+from json.encoder import encode_basestring
+import random
+import string
+from collections import deque
+
+from automaton import DFA, NFA
+
+# Single-character symbols that are safe in corpus files (one string per line), larger alphabets continue past Latin-1
+BASE_SYMBOLS = string.ascii_lowercase + string.ascii_uppercase + string.digits
+
+def make_alphabet(size):
+    return [BASE_SYMBOLS[index] if index < len(BASE_SYMBOLS) else chr(0x100 + index) for index in range(size)]
+
+def state_name(index):
+    return f"q{index}"
+
+class GeneratedAutomaton:
+    # Lazy description in the load_from_json schema. states, delta and accept_states are
+    # callables returning fresh iterators, each seeded on its own so every pass is repeatable
+    # and nothing has to be held in memory to write or build the automaton.
+
+    def __init__(self, alphabet, states, delta, start_state, accept_states):
+        self.alphabet = alphabet
+        self.states = states
+        self.delta = delta
+        self.start_state = start_state
+        self.accept_states = accept_states
+
+    def to_json(self):
+        return {
+            "alphabet": list(self.alphabet),
+            "states": list(self.states()),
+            "delta": [{"state": state, "input": symbol, "next_state": next_state} for state, symbol, next_state in self.delta()],
+            "start_state": self.start_state,
+            "accept_states": list(self.accept_states()),
+        }
+
+    def build(self):
+        automaton_class = NFA if "<EPSILON>" in self.alphabet else DFA
+        return automaton_class.from_edges(self.states(), self.delta(), self.start_state, self.accept_states(), self.alphabet)
+
+    def write_json(self, file_path, batch_size=4096):
+        # Stream the description to disk section by section, load it back with load_from_json_file
+        with open(file_path, "w", encoding="utf-8") as file:
+            file.write('{"alphabet": ' + json.dumps(list(self.alphabet)))
+            file.write(',\n"states": [')
+            write_array(file, map(encode_basestring, self.states()), batch_size)
+            file.write('],\n"delta": [')
+            edges = (f'{{"state": {encode_basestring(state)}, "input": {encode_basestring(symbol)}, "next_state": {encode_basestring(next_state)}}}' for state, symbol, next_state in self.delta())
+            write_array(file, edges, batch_size)
+            file.write('],\n"start_state": ' + json.dumps(self.start_state))
+            file.write(',\n"accept_states": [')
+            write_array(file, map(encode_basestring, self.accept_states()), batch_size)
+            file.write(']}\n')
+
+def write_array(file, items, batch_size):
+    first = True
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            file.write(("" if first else ",\n") + ",\n".join(batch))
+            first = False
+            batch = []
+    if batch:
+        file.write(("" if first else ",\n") + ",\n".join(batch))
+
+def _random_states(num_states, seed, section, ratio):
+    generator = random.Random(f"{seed}:{section}")
+    return (state_name(index) for index in range(num_states) if generator.random() < ratio)
+
+def random_dfa(num_states, alphabet_size=2, seed=0, density=1.0, accept_ratio=0.5):
+    # density=1.0 gives a complete DFA, lower values drop each transition with probability 1 - density
+    if num_states < 1:
+        raise ValueError("A generated automaton needs at least one state")
+    alphabet = make_alphabet(alphabet_size)
+
+    def delta():
+        generator = random.Random(f"{seed}:delta")
+        for index in range(num_states):
+            for symbol in alphabet:
+                if density >= 1.0 or generator.random() < density:
+                    yield state_name(index), symbol, state_name(generator.randrange(num_states))
+
+    return GeneratedAutomaton(alphabet, lambda: map(state_name, range(num_states)), delta, state_name(0),
+                              lambda: _random_states(num_states, seed, "accept", accept_ratio))
+
+def random_nfa(num_states, alphabet_size=2, seed=0, fanout=2, epsilon_density=0.1, accept_ratio=0.1):
+    # Every (state, symbol) pair gets 0..fanout targets. epsilon_density is the mean number of
+    # epsilon edges per state, 0.1 gives roughly one state in ten an epsilon edge.
+    if num_states < 1:
+        raise ValueError("A generated automaton needs at least one state")
+    alphabet = make_alphabet(alphabet_size)
+    whole, fraction = divmod(epsilon_density, 1)
+
+    def delta():
+        generator = random.Random(f"{seed}:delta")
+        for index in range(num_states):
+            for symbol in alphabet:
+                for _ in range(generator.randint(0, fanout)):
+                    yield state_name(index), symbol, state_name(generator.randrange(num_states))
+            for _ in range(int(whole) + (generator.random() < fraction)):
+                yield state_name(index), "<EPSILON>", state_name(generator.randrange(num_states))
+
+    return GeneratedAutomaton(alphabet + ["<EPSILON>"], lambda: map(state_name, range(num_states)), delta, state_name(0),
+                              lambda: _random_states(num_states, seed, "accept", accept_ratio))
+
+# Worst-case families
+
+def counter_dfa(num_states, alphabet_size=2):
+    # The first symbol counts modulo num_states, the others reset to q0. Every state is distinguishable,
+    # so minimization cannot shrink it.
+    alphabet = make_alphabet(alphabet_size)
+
+    def delta():
+        for index in range(num_states):
+            yield state_name(index), alphabet[0], state_name((index + 1) % num_states)
+            for symbol in alphabet[1:]:
+                yield state_name(index), symbol, state_name(0)
+
+    return GeneratedAutomaton(alphabet, lambda: map(state_name, range(num_states)), delta, state_name(0), lambda: iter([state_name(0)]))
+
+def nth_from_last(n):
+    # (a|b)*a(a|b){n}: n + 2 NFA states, but the equivalent DFA needs 2^(n+1)
+    def delta():
+        yield "q0", "a", "q0"
+        yield "q0", "b", "q0"
+        yield "q0", "a", "q1"
+        for index in range(1, n + 1):
+            yield state_name(index), "a", state_name(index + 1)
+            yield state_name(index), "b", state_name(index + 1)
+
+    return GeneratedAutomaton(["a", "b", "<EPSILON>"], lambda: map(state_name, range(n + 2)), delta, "q0", lambda: iter([state_name(n + 1)]))
+
+def epsilon_chain(length):
+    # Strings of a's: every a leads back to the head of a chain of epsilon edges, so each step expands the whole chain
+    def delta():
+        for index in range(length):
+            yield state_name(index), "<EPSILON>", state_name(index + 1)
+        yield state_name(length), "a", "q0"
+        yield state_name(length), "b", state_name(length + 1)
+
+    return GeneratedAutomaton(["a", "b", "<EPSILON>"], lambda: map(state_name, range(length + 2)), delta, "q0", lambda: iter([state_name(length)]))
+
+# Corpora
+
+def _moves(automaton, state):
+    # (symbol, next_state) pairs leaving a state, symbol is None for epsilon moves
+    transitions = automaton.states[state].transitions
+    if isinstance(automaton, DFA):
+        return list(transitions.items())
+    moves = [(None, next_state) for next_state in transitions.get("epsilon_transitions", ())]
+    for symbol, next_states in (automaton.states[state].edges or {}).items():
+        moves.extend((symbol, next_state) for next_state in next_states)
+    return moves
+
+def _paths_to_accept(automaton):
+    # Backwards breadth-first search from the accept states: the first move of a shortest path to acceptance, per state
+    incoming = {}
+    for state in automaton.states:
+        for symbol, next_state in _moves(automaton, state):
+            incoming.setdefault(next_state, []).append((state, symbol))
+
+    toward = {state: None for state in automaton.accept_states if state in automaton.states}
+    queue = deque(toward)
+    while queue:
+        next_state = queue.popleft()
+        for state, symbol in incoming.get(next_state, ()):
+            if state not in toward:
+                toward[state] = (symbol, next_state)
+                queue.append(state)
+    return toward
+
+def _accepts(automaton, input_string):
+    if isinstance(automaton, NFA):
+        return automaton.process_string(input_string, automaton.start_state)[0] == "ACCEPT"
+    return automaton.process_string(input_string)[0] == "ACCEPT"
+
+def generate_corpus(automaton, count, seed=0, accept_ratio=0.5, min_length=0, max_length=32, max_attempts=1000):
+    # Yield (string, "ACCEPT" | "REJECT") pairs. Accepted strings come from random walks that stay
+    # able to reach an accept state, rejected ones from random strings checked against the automaton.
+    generator = random.Random(f"{seed}:corpus")
+    symbols = sorted(automaton.alphabet - {"<EPSILON>"})
+    toward = _paths_to_accept(automaton)
+
+    for _ in range(count):
+        length = generator.randint(min_length, max_length)
+        if generator.random() < accept_ratio:
+            if automaton.start_state not in toward:
+                raise ValueError("The automaton does not accept any string")
+            yield _accepted_string(automaton, toward, length, generator), "ACCEPT"
+        else:
+            # A fresh length on every attempt, a single length may have no rejected strings at all
+            for attempt in range(max_attempts):
+                if attempt:
+                    length = generator.randint(min_length, max_length)
+                candidate = "".join(generator.choices(symbols, k=length)) if symbols else ""
+                if not _accepts(automaton, candidate):
+                    yield candidate, "REJECT"
+                    break
+            else:
+                raise ValueError(f"No rejected string found in {max_attempts} attempts")
+
+def _accepted_string(automaton, toward, length, generator):
+    state = automaton.start_state
+    output = []
+
+    # Wander while the walk can still finish in an accept state, then take the shortest way there
+    steps = 0
+    while len(output) < length and steps < 4 * length:
+        moves = [move for move in _moves(automaton, state) if move[1] in toward]
+        if not moves:
+            break
+        symbol, state = generator.choice(moves)
+        if symbol is not None:
+            output.append(symbol)
+        steps += 1
+
+    while toward[state] is not None:
+        symbol, state = toward[state]
+        if symbol is not None:
+            output.append(symbol)
+    return "".join(output)
+
+def write_corpus(automaton, file_path, count, seed=0, accept_ratio=0.5, min_length=0, max_length=32, labels_path=None):
+    # One string per line as read by process_corpus, the expected results optionally go to a parallel file
+    labels = open(labels_path, "w", encoding="utf-8") if labels_path else None
+    try:
+        with open(file_path, "w", encoding="utf-8") as corpus:
+            for input_string, result in generate_corpus(automaton, count, seed, accept_ratio, min_length, max_length):
+                corpus.write(input_string + "\n")
+                if labels:
+                    labels.write(result + "\n")
+    finally:
+        if labels:
+            labels.close()
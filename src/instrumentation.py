@@ -0,0 +1,30 @@
+class Stats:
+    # Counters filled by process_string while instrumentation is enabled on an automaton.
+    # The uninstrumented paths never touch this object, they only check that it is absent.
+
+    fields = ("calls", "symbols", "transitions", "epsilon_expansions", "dead_ends", "peak_active", "cache_hits", "cache_misses", "seconds")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.symbols = 0
+        self.transitions = 0
+        self.epsilon_expansions = 0
+        self.dead_ends = 0
+        self.peak_active = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.seconds = 0.0
+
+    def snapshot(self):
+        return {field: getattr(self, field) for field in self.fields}
+
+    def report(self):
+        # Lines printed by the REPL stats command
+        lines = [f"{field}: {getattr(self, field)}" for field in self.fields if field != "seconds"]
+        lines.append(f"seconds: {self.seconds:.6f}")
+        if self.symbols and self.seconds:
+            lines.append(f"symbols/s: {self.symbols / self.seconds:.0f}")
+        return lines
@@ -1,163 +1,355 @@
-from automaton import DFA, NFA
+import hashlib
+import json
+import os
+import time
+import tracemalloc
 
-def load_from_json(json_data):
+from automaton import DFA, NFA
+from compiled import DEAD, CompiledDFA
+from regex_compiler import compile_regex, regex_cache
+from search import automaton_edges
+
+# Part of every cache key, bump it whenever loading or construction changes what gets built
+LOADER_VERSION = 3
+
+class PeakMemory:
+    # Peak bytes allocated by Python inside the block, or None when not measured.
+    # tracemalloc slows construction several times over, so it only runs when enabled, and never
+    # when something else is already tracing since restarting it would reset that peak.
+    def __init__(self, enabled=True):
+        self.enabled = enabled and not tracemalloc.is_tracing()
+        self.peak = None
+
+    def __enter__(self):
+        if self.enabled:
+            tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.enabled:
+            self.peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+def delta_edges(delta):
+    for transition in delta:
+        yield transition['state'], transition['input'], transition['next_state']
+
+def load_from_json(json_data, determinize=False, minimize=False, quiet=False, trace_memory=False):
+    started = time.perf_counter()
 
     # Use json to determine if machine is DFA or NFA
     alphabet = set(json_data.get("alphabet", []))
     automaton_type = "NFA" if "<EPSILON>" in alphabet else "DFA"
-    print(f"Loading {automaton_type} from JSON...")
+    if not quiet:
+        print(f"Loading {automaton_type} from JSON...")
 
     # Start building FA
-    automaton = NFA() if "<EPSILON>" in alphabet else DFA()
-
-    for state in json_data['states']:
-        automaton.add_state(state)
-    for transition in json_data['delta']:
-        if transition['input'] == "<EPSILON>":
-            automaton.add_epsilon_transition(
-                transition['state'], transition['next_state']
-            )
-        else:
-            automaton.add_transition(
-                transition['state'], transition['input'], transition['next_state']
-            )
-    automaton.set_start_state(json_data['start_state'])
-    automaton.set_accept_states(json_data['accept_states'])
-    automaton.alphabet = alphabet
+    automaton_class = NFA if "<EPSILON>" in alphabet else DFA
+    with PeakMemory(trace_memory) as memory:
+        automaton = automaton_class.from_edges(
+            json_data['states'], delta_edges(json_data['delta']),
+            json_data['start_state'], json_data['accept_states'], alphabet
+        )
+    automaton.build_info = {"source": "json", "states": len(automaton.states), "seconds": time.perf_counter() - started, "peak_bytes": memory.peak}
+
+    return prepare(automaton, determinize, minimize)
+
+def prepare(automaton, determinize=False, minimize=False):
+    # Trade a one-off subset construction for cheaper DFA queries
+    if (determinize or minimize) and isinstance(automaton, NFA):
+        automaton = automaton.to_dfa()
+    if minimize:
+        automaton = automaton.minimize()
     return automaton
 
-def load_from_regex(regex):
-
-    # DFA
-    automaton = DFA()
-
-    current_state = 0
-    automaton.add_state("q0")
-    automaton.set_start_state("q0")
-
-    current_state, automaton = parse_regex(regex, current_state, automaton)
-    
-    automaton.set_accept_states([f"q{current_state}"])
-    return automaton
-
-
-def parse_regex(regex, current_state, automaton):
-
-    regex_symbols = ['*', '+', '?', '^', '$', '(',')']
-
-    alphabet = set()
-    previousSymbol = str()
-
-    expression_size = 0
+def save_compiled(automaton, file_path):
+    # Write a DFA (compiled on the fly if needed) in the binary format read by load_compiled
+    if isinstance(automaton, NFA):
+        automaton = automaton.to_dfa()
+    compiled = automaton.compile() if isinstance(automaton, DFA) else automaton
+    compiled.save(file_path)
+
+def load_compiled(file_path):
+    # Memory-map a compiled DFA, the tables are used in place without parsing
+    return CompiledDFA.load(file_path)
+
+def dfa_from_compiled(compiled):
+    # Plain DFA over the same states, DEAD entries become missing transitions
+    names = list(compiled.state_names)
+    edges = []
+    for state, name in enumerate(names):
+        row = state * compiled.num_symbols
+        for symbol_id, symbol in enumerate(compiled.symbols):
+            next_state = compiled.table[row + symbol_id]
+            if next_state == DEAD:
+                continue
+            if not 0 <= next_state < len(names):
+                raise ValueError(f"Transition to unknown state id {next_state}")
+            edges.append((name, symbol, names[next_state]))
+    if not 0 <= compiled.start < len(names):
+        raise ValueError(f"Unknown start state id {compiled.start}")
+    accept_states = [name for state, name in enumerate(names) if compiled.accepting[state]]
+    return DFA.from_edges(names, edges, names[compiled.start], accept_states, compiled.symbols)
+
+def save_json(automaton, file_path):
+    # Write an automaton in the schema read by load_from_json_file
+    with open(file_path, "w", encoding="utf-8") as file:
+        json.dump({
+            "alphabet": sorted(automaton.alphabet),
+            "states": list(automaton.states),
+            "delta": [{"state": state, "input": symbol, "next_state": next_state} for state, symbol, next_state in automaton_edges(automaton)],
+            "start_state": automaton.start_state,
+            "accept_states": sorted(automaton.accept_states),
+        }, file)
+
+class JSONStream:
+    # Incremental reader for one top-level JSON object whose array values are yielded element by element
+
+    def __init__(self, file, chunk_size=1 << 16):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def _peek(self):
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in " \t\r\n":
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON input")
+
+    def _expect(self, characters):
+        character = self._peek()
+        if character not in characters:
+            raise ValueError(f"Expected one of {characters!r} in JSON input, found {character!r}")
+        self.position += 1
+        return character
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+
+                # A value that touches the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def _array(self):
+        self._expect("[")
+        if self._peek() == "]":
+            self.position += 1
+            return
+        while True:
+            yield self._value()
+            if self._expect(",]") == "]":
+                return
 
-    for index, symbol in enumerate(regex):
-        if symbol not in regex_symbols:
-            expression_size += 1
-            if not symbol.isalnum():
-                print("Unrecognized symbol in regular expression.")
+    def items(self):
+        # Yield (key, value) pairs, array values are lazy iterators that are drained if left unread
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if self._peek() == "[":
+                values = self._array()
+                yield key, values
+                for _ in values:
+                    pass
+            else:
+                yield key, self._value()
+            if self._expect(",}") == "}":
                 return
-            
-            # Keep track of symbol
-            previousSymbol = symbol
-            
-            if symbol not in alphabet:
-                alphabet.add(symbol)
-
-                # Skip adding transition if current symbol will be modified by regex
-                if index < len(regex) - 1 and regex[index + 1] in regex_symbols and (regex[index + 1] != ')' and regex[index + 1] != '('):
-                    continue
-                
-                # Create transition between states that handles new symbol
-                automaton.add_state(f"q{current_state}")
-                automaton.add_state(f"q{current_state + 1}")
-                automaton.add_transition(f"q{current_state}", symbol, f"q{current_state + 1}")
-                current_state += 1
 
+def load_from_json_file(file_path, determinize=False, minimize=False, chunk_size=1 << 16, quiet=False, trace_memory=False):
+    started = time.perf_counter()
+    automaton = None
+    alphabet = []
+    start_state = None
+    accept_states = []
+
+    # Anything that arrives before the alphabet (which decides DFA vs NFA) is staged until then
+    pending_states = []
+    pending_edges = []
+
+    with PeakMemory(trace_memory) as memory, open(file_path, encoding="utf-8") as file:
+        for key, value in JSONStream(file, chunk_size).items():
+            if key == "alphabet":
+                alphabet = set(value)
+                automaton_type = "NFA" if "<EPSILON>" in alphabet else "DFA"
+                if not quiet:
+                    print(f"Loading {automaton_type} from JSON...")
+                automaton = NFA() if "<EPSILON>" in alphabet else DFA()
+                for state in pending_states:
+                    automaton.add_state(state)
+                automaton.add_edges(pending_edges)
+                pending_states = pending_edges = None
+            elif key == "states":
+                if automaton is None:
+                    pending_states.extend(value)
+                else:
+                    for state in value:
+                        automaton.add_state(state)
+            elif key == "delta":
+                if automaton is None:
+                    pending_edges.extend(delta_edges(value))
+                else:
+                    automaton.add_edges(delta_edges(value))
+            elif key == "start_state":
+                start_state = value
+            elif key == "accept_states":
+                accept_states = list(value)
+
+    if automaton is None:
+        if not quiet:
+            print("Loading DFA from JSON...")
+        automaton = DFA.from_edges(pending_states, pending_edges)
+
+    automaton.set_start_state(start_state)
+    automaton.set_accept_states(accept_states)
+    automaton.alphabet = set(alphabet)
+    automaton.build_info = {"source": "json", "states": len(automaton.states), "seconds": time.perf_counter() - started, "peak_bytes": memory.peak}
+
+    return prepare(automaton, determinize, minimize)
+
+def load_from_regex(regex, cached=True):
+
+    # The compiler always determinizes and minimizes.
+    # Cached results are frozen and shared, pass cached=False for a private automaton that can be modified.
+    if cached:
+        return regex_cache.get(regex)
+    return compile_regex(regex)
+
+
+class CompileCache:
+    # Processed automata keyed by a hash of the JSON content, the loader version and the requested variant
+
+    def __init__(self, directory=None, max_bytes=512 << 20):
+        self.directory = directory or os.environ.get("AUTOMATA_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "automata-simulators")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, file_path, determinize=False, minimize=False):
+        digest = hashlib.sha256(f"{LOADER_VERSION}:{int(determinize)}:{int(minimize)}:".encode())
+        with open(file_path, "rb") as file:
+            while chunk := file.read(1 << 20):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def load(self, file_path, determinize=False, minimize=False, compiled=False, quiet=False):
+        # Compiled entries (.fa) and plain DFAs (.dfa) hold the binary tables, NFAs (.json) their JSON description.
+        # Nothing in an entry is executed, so a corrupt or foreign one is simply dropped and rebuilt.
+        key = os.path.join(self.directory, self.key(file_path, determinize, minimize))
+        for entry in [key + ".fa"] if compiled else [key + ".dfa", key + ".json"]:
+            if not os.path.exists(entry):
+                continue
+            try:
+                result = self.read(entry)
+            except (OSError, ValueError):
+                result = None
+                try:
+                    os.remove(entry)
+                except OSError:
+                    pass
+
+            if result is not None:
+                # Touch the entry so eviction drops the least recently used ones first
+                os.utime(entry)
+                self.hits += 1
+                if not quiet:
+                    print(f"Loading {'NFA' if isinstance(result, NFA) else 'DFA'} from JSON...")
+                return result
+
+        self.misses += 1
+        automaton = load_from_json_file(file_path, determinize, minimize, quiet=quiet)
+
+        entry = key + (".fa" if compiled else ".json" if isinstance(automaton, NFA) else ".dfa")
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = f"{entry}.{os.getpid()}.tmp"
+        if entry.endswith(".json"):
+            save_json(automaton, temporary)
         else:
-            if previousSymbol:
-                match (symbol):
-                    case '*':
-                        
-                        # Add transition loop to same state
-                        automaton.add_transition(f"q{current_state}", previousSymbol, f"q{current_state}")
-
-                    case '+':
-
-                        # Add transition from current state to next state to ensure symbol is typed at least once
-                        automaton.add_state(f"q{current_state + 1}")
-                        automaton.add_transition(f"q{current_state}", previousSymbol, f"q{current_state + 1}")
-                        current_state+=1
-
-                        # Add transition to same state to ensure it can be written 1+ times
-                        automaton.add_transition(f"q{current_state}", previousSymbol, f"q{current_state}")
-
-                    case '?':
-
-                        # Add transition from current state to new state that covers case where symbol appears
-                        automaton.add_state(f"q{current_state + len(regex)}")
-                        automaton.add_transition(f"q{current_state}", previousSymbol, f"q{current_state + len(regex)}")
-
-                        # Check if there is another symbol next to this expression
-                        if index + 1 < len(regex) - 1:
-
-                            # Add transition from new state to the next state in order
-                            automaton.add_transition(f"q{current_state + len(regex)}", regex[index + 1], f"q{current_state + 1}")
-
-                    case '$':
-
-                        automaton.add_transition(f"q{current_state}", regex[index - 1], f"q{current_state + 1}")
-                        current_state += 1
-                        
-                    case '^':
-                        continue
-                    case '(':
-
-                        # Reset expression size counter
-                        expression_size = 0
-
-                    case ')':
-                        previousSymbol = None
-
-                        # Check if there are any characters after the sub-expression
-                        if index < len(regex) - 1:
-
-                            # Check type of regex expression
-                            match (regex[index + 1]):
-                                case '*':
-
-                                    # Add transition back to state where sub-expression started
-                                    automaton.add_transition(f"q{current_state}", regex[index - expression_size], f"q{current_state - expression_size + 1}")
-
-                                    if index < len(regex) - 2:
-
-                                        # Add transition from initial sub-expression state to final sub-expression state
-                                        automaton.add_transition(f"q{current_state - expression_size}", regex[index + 2], f"q{current_state + 1}")
-
-                                case '+':
-
-                                    # Add transition back to state where sub-expression started
-                                    automaton.add_transition(f"q{current_state}", regex[index - expression_size], f"q{current_state - expression_size + 1}")
-
-                                case '?':
-
-                                    # If there is a symbol after the sub-expresion
-                                    if index < len(regex) - 2:
-
-                                        # Add transition from initial state to final state
-                                        automaton.add_transition(f"q{current_state - expression_size}", regex[index + 2], f"q{current_state + 1}")
-                                    else:
-                                        print(current_state - expression_size)
-                                        automaton.add_transition(f"q{current_state}", '', f"q{current_state - expression_size}")
-                                        current_state = current_state - expression_size
-                                case '$':
-                                    continue
-                                case '^':
-                                    continue
-                                case _:
-                                    print("Symbol", symbol, "not in regex dictionary")
-                                    return None
-                    case _:
-                        print("Symbol", symbol, "not in regex dictionary")
-                        return None
-            
-    return current_state, automaton
\ No newline at end of file
+            save_compiled(automaton, temporary)
+        os.replace(temporary, entry)
+        self.evict()
+
+        if not compiled:
+            return automaton
+
+        # Hand back the memory-mapped form unless the entry was too large to keep
+        if os.path.exists(entry):
+            return load_compiled(entry)
+        return (automaton.to_dfa() if isinstance(automaton, NFA) else automaton).compile()
+
+    def read(self, entry):
+        if entry.endswith(".json"):
+            automaton = load_from_json_file(entry, quiet=True)
+            if not isinstance(automaton, NFA):
+                raise ValueError(f"'{entry}' does not describe an NFA")
+            return automaton
+        compiled = load_compiled(entry)
+        return compiled if entry.endswith(".fa") else dfa_from_compiled(compiled)
+
+    def entries(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return [entry for entry in os.scandir(self.directory) if entry.name.endswith((".fa", ".dfa", ".json"))]
+
+    def evict(self):
+        entries = sorted(self.entries(), key=lambda entry: entry.stat().st_mtime)
+        total = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            total -= entry.stat().st_size
+            os.remove(entry.path)
+            self.evictions += 1
+
+    def clear(self):
+        for entry in self.entries():
+            os.remove(entry.path)
+
+    def stats(self):
+        entries = self.entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum(entry.stat().st_size for entry in entries),
+            "max_bytes": self.max_bytes
+        }
+
+_default_cache = None
+
+def default_cache():
+    # Shared cache, recreated if AUTOMATA_CACHE_DIR points somewhere else
+    global _default_cache
+    if _default_cache is None or _default_cache.directory != CompileCache().directory:
+        _default_cache = CompileCache()
+    return _default_cache
+
+def load_cached(file_path, determinize=False, minimize=False, compiled=False, cache=None, quiet=False):
+    return (cache or default_cache()).load(file_path, determinize, minimize, compiled, quiet)
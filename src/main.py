@@ -1,54 +1,216 @@
-import json
-from loader import load_from_json, load_from_regex
+import sys
 from automaton import DFA, NFA
+from corpus import process_corpus
+from registry import Registry
+
+def parse_options(command):
+    # Collect --key=value flags, flags without a value map to True
+    options = {}
+    for token in command:
+        if token.startswith("--"):
+            key, _, value = token[2:].partition("=")
+            options[key] = value or True
+    return options
+
+def read_chunks(file_path, chunk_size=1 << 16):
+    # Bytes are read as latin-1 so every byte is one symbol, as in DFA.process_file
+    with open(file_path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            yield chunk.decode("latin-1")
+
+def process_file(automaton, file_path):
+    if isinstance(automaton, DFA):
+        result, message, report = automaton.process_file(file_path)
+        print(f"{result} {message}")
+        if report["offset"] is not None:
+            print(f"Rejected at byte offset {report['offset']}")
+        print(f"Scanned {report['bytes']} bytes in {report['seconds']:.3f}s ({report['bytes_per_second'] / 1e6:.2f} MB/s)")
+    elif isinstance(automaton, NFA):
+        result, message = automaton.start().consume(read_chunks(file_path))
+        print(f"{result} {message}")
+
+def run_corpus(automaton, options):
+    output_format = "tsv" if options.get("format") == "tsv" else "ndjson"
+    workers = int(options["workers"]) if "workers" in options else None
+
+    if "output" in options:
+        with open(options["output"], "w", encoding="utf-8") as output:
+            summary = process_corpus(automaton, options["corpus"], output, workers, output_format)
+    else:
+        summary = process_corpus(automaton, options["corpus"], sys.stdout, workers, output_format)
+
+    print(f"Processed {summary['strings']} strings: {summary['accepted']} accepted, {summary['rejected']} rejected")
+    print(f"{summary['strings_per_second']:.0f} strings/s, p50 {summary['p50'] * 1e6:.1f}us, p99 {summary['p99'] * 1e6:.1f}us")
+
+def run_stats(automaton, action):
+    if action == "reset":
+        if automaton.stats is not None:
+            automaton.stats.reset()
+        print("Statistics reset.")
+    elif automaton.stats is None:
+        print("Statistics are off, enable them with 'stats on'.")
+    else:
+        for line in automaton.stats.report():
+            print(line)
+
+def run_search(automaton, options, arguments):
+    # Spans are printed with the matched text for strings and on their own for files
+    if options.get("input") == "file":
+        with open(arguments[0], "rb") as file:
+            text = file.read().decode("latin-1")
+    else:
+        text = arguments[0] if arguments else ""
+
+    count = 0
+    for start, end in automaton.finditer(text, overlapping="all" in options):
+        count += 1
+        if options.get("input") == "file":
+            print(f"Match at {start}-{end}")
+        else:
+            print(f"Match at {start}-{end}: '{text[start:end]}'")
+    print(f"{count} match{'' if count == 1 else 'es'}")
+
+def format_bytes(size):
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+def parse_size(text):
+    # 512, 64K, 100M or 2G, powers of 1024
+    multipliers = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    text = text.upper().removesuffix("B").removesuffix("I")
+    if text and text[-1] in multipliers:
+        return int(float(text[:-1]) * multipliers[text[-1]])
+    return int(text)
+
+def fetch(registry, name, stats_enabled):
+    # Automaton registered under name, reloaded from its source if the budget unloaded it
+    if name is None:
+        print("No automaton loaded.")
+        return None
+    if name not in registry:
+        print(f"No automaton named '{name}'.")
+        return None
+    automaton = registry.get(name)
+
+    # Entries instrumented before "stats off" drop their counters the next time they are used
+    if stats_enabled:
+        automaton.enable_stats()
+    else:
+        automaton.disable_stats()
+    return automaton
+
+def print_registry(registry, current):
+    for row in registry.listing():
+        marker = "*" if row["name"] == current else " "
+        status = "" if row["loaded"] else " (unloaded)"
+        peak = f", peak {format_bytes(row['peak_bytes'])}" if row["peak_bytes"] is not None else ""
+        print(f"{marker} {row['name']}: {row['type']}, {row['states']} states, {format_bytes(row['bytes'])}, loaded in {row['seconds']:.3f}s{peak}{status}")
+    budget = format_bytes(registry.max_bytes) if registry.max_bytes is not None else "none"
+    print(f"Total {format_bytes(registry.total_bytes())} in memory, budget {budget}")
 
 def main():
-    automaton_in_memory = None
+    # Automata are kept under names, "default" for loads without --name
+    registry = Registry()
+    current = None
+
+    # Set by "stats on", every automaton used afterwards is instrumented as well until "stats off"
+    stats_enabled = False
 
     while True:
         command = input(">> ").strip().split()
+        options = parse_options(command)
+        arguments = [token for token in command[1:] if not token.startswith("--")]
 
         if command[0] == "load":
-            if command[1] == "--input=file":
-                with open(command[2]) as file:
-                    data = json.load(file)
-                    automaton_in_memory = load_from_json(data)
+            name = options.get("name", "default")
+            if options.get("input") == "file" and arguments and name is not True:
+                registry.add(name, ("file", arguments[0]), trace_memory="measure" in options)
+                current = name
+
+                # --measure reports the time and peak memory of this load
+                if "measure" in options:
+                    row = next(row for row in registry.listing() if row["name"] == name)
+                    print(f"Loaded {name} in {row['seconds']:.3f}s, peak {format_bytes(row['peak_bytes'])}")
             else:
                 print("Invalid load command.")
+        elif command[0] == "use":
+            if arguments and arguments[0] in registry:
+                current = arguments[0]
+                print(f"Using {current}.")
+            else:
+                print(f"No automaton named '{arguments[0] if arguments else ''}'.")
         elif command[0] == "process":
-            if automaton_in_memory:
-                input_string = command[1]
-
-                # Check if --verbose is provided in the command
-                verbose = "--verbose" in command
-
-                if verbose:
-                    if isinstance(automaton_in_memory, DFA):
-                        result, message, path = automaton_in_memory.process_string(input_string, verbose=True)
-                        print(f"{result} {message}")
-                        for step in path:
-                            print(f"{step[0]} --({step[1]})--> {step[2]}")
-                    elif isinstance(automaton_in_memory, NFA):
-                        result, message, path = automaton_in_memory.process_string(input_string, automaton_in_memory.start_state, verbose=True)
-                        print(f"{result} {message}")
-                        for step in path:
-                            print(f"{step[0]} --({step[1]})--> {step[2]}")
-                else:
-                    if isinstance(automaton_in_memory, DFA):
-                        result, message = automaton_in_memory.process_string(input_string)
-                    elif isinstance(automaton_in_memory, NFA):
-                        result, message = automaton_in_memory.process_string(input_string, automaton_in_memory.start_state)
-                    print(f"{result} {message}")
+            automaton = fetch(registry, options.get("with", current), stats_enabled)
+            if automaton is None:
+                pass
+            elif "corpus" in options:
+                run_corpus(automaton, options)
+            elif options.get("input") == "file" and arguments:
+                process_file(automaton, arguments[0])
             else:
-                print("No automaton loaded.")
+                input_string = arguments[0] if arguments else ""
+
+                # With --verbose the steps are printed as they are produced
+                steps = ()
+                if isinstance(automaton, DFA):
+                    result, message = automaton.process_string(input_string)
+                    if "verbose" in options:
+                        steps = automaton.iter_steps(input_string)
+                elif "verbose" in options:
+                    # A single traced run gives both the result and the accepting path
+                    result, message, steps = automaton.trace(input_string)
+                else:
+                    result, message = automaton.process_string(input_string, automaton.start_state)
+                print(f"{result} {message}")
+                for step in steps:
+                    print(f"{step[0]} --({step[1]})--> {step[2]}")
+        elif command[0] == "search":
+            automaton = fetch(registry, options.get("with", current), stats_enabled)
+            if automaton is not None:
+                run_search(automaton, options, arguments)
         elif command[0] == "regex":
-            automaton_in_memory = load_from_regex(command[2])
-            print("Loaded DFA from Regular Expression.")
-        elif command[0] == "print":
-            if automaton_in_memory:
-                automaton_in_memory.print_fa()
+            try:
+                registry.add(command[1], ("regex", command[2]))
+                current = command[1]
+                print("Loaded DFA from Regular Expression.")
+            except ValueError as error:
+                print(error)
+        elif command[0] == "list":
+            print_registry(registry, current)
+        elif command[0] == "budget":
+            if arguments and arguments[0] == "off":
+                registry.set_budget(None)
+            elif arguments:
+                try:
+                    registry.set_budget(parse_size(arguments[0]))
+                except ValueError:
+                    print(f"Invalid budget '{arguments[0]}'.")
+                    continue
+            print(f"Budget {format_bytes(registry.max_bytes) if registry.max_bytes is not None else 'none'}.")
+        elif command[0] == "unload":
+            if arguments and arguments[0] in registry:
+                registry.unload(arguments[0])
+                print(f"Unloaded {arguments[0]}.")
+            else:
+                print(f"No automaton named '{arguments[0] if arguments else ''}'.")
+        elif command[0] == "stats":
+            action = arguments[0] if arguments else "show"
+            if action in ("on", "off"):
+                stats_enabled = action == "on"
+                if current is not None:
+                    fetch(registry, current, stats_enabled)
+                print(f"Statistics {action}.")
             else:
-                print("No automaton loaded.")
+                automaton = fetch(registry, current, stats_enabled)
+                if automaton is not None:
+                    run_stats(automaton, action)
+        elif command[0] == "print":
+            automaton = fetch(registry, current, stats_enabled)
+            if automaton is not None:
+                automaton.print_fa()
         elif command[0] == "exit":
             break
         else:
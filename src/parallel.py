@@ -0,0 +1,125 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from compiled import DEAD
+
+# Inputs at least this long are split across processes by DFA.process_string
+PARALLEL_THRESHOLD = 1 << 23
+
+# Speculation is abandoned when the origins of a chunk have not merged into this many states within
+# the window, every further symbol would cost one table lookup per remaining state
+SPECULATION_WINDOW = 1 << 10
+MAX_SPECULATIVE_STATES = 8
+
+# Compiled DFA shared with every worker through the pool initializer
+_worker_dfa = None
+
+def _init_worker(compiled):
+    global _worker_dfa
+    _worker_dfa = compiled
+
+def parallel_available():
+    # Automatic splitting needs a second CPU, and pool workers never start pools of their own
+    return (os.cpu_count() or 1) > 1 and multiprocessing.parent_process() is None
+
+def chunk_outcomes(compiled, chunk, origins=None):
+    # Run the chunk from every origin state at once, merging origins as soon as they reach the same state.
+    # Each outcome is ("state", end) or (reason, offset, state) where reason is "invalid" or "dead".
+    # Returns None when the origins do not merge quickly enough for speculation to pay off.
+    symbol_ids = compiled.symbol_ids
+    table = compiled.table
+    num_symbols = compiled.num_symbols
+
+    if origins is None:
+        origins = range(len(compiled.state_names))
+    groups = {origin: [origin] for origin in origins}
+    outcomes = {}
+
+    offset = 0
+    while offset < len(chunk) and len(groups) > 1:
+        if offset == SPECULATION_WINDOW and len(groups) > MAX_SPECULATIVE_STATES:
+            return None
+        symbol = chunk[offset]
+        symbol_id = symbol_ids.get(symbol)
+        if symbol_id is None:
+            for current_state, group in groups.items():
+                for origin in group:
+                    outcomes[origin] = ("invalid", offset, current_state)
+            return outcomes
+
+        following = {}
+        for current_state, group in groups.items():
+            next_state = table[current_state * num_symbols + symbol_id]
+            if next_state == DEAD:
+                for origin in group:
+                    outcomes[origin] = ("dead", offset, current_state)
+            elif next_state in following:
+                following[next_state].extend(group)
+            else:
+                following[next_state] = group
+        groups = following
+        offset += 1
+
+    # Once every origin has merged into one state the rest of the chunk is a plain sequential walk
+    for current_state, group in groups.items():
+        outcome = None
+        for offset in range(offset, len(chunk)):
+            symbol = chunk[offset]
+            symbol_id = symbol_ids.get(symbol)
+            if symbol_id is None:
+                outcome = ("invalid", offset, current_state)
+                break
+            next_state = table[current_state * num_symbols + symbol_id]
+            if next_state == DEAD:
+                outcome = ("dead", offset, current_state)
+                break
+            current_state = next_state
+
+        for origin in group:
+            outcomes[origin] = outcome or ("state", current_state)
+    return outcomes
+
+def _worker_outcomes(chunk, origins):
+    return chunk_outcomes(_worker_dfa, chunk, origins)
+
+def process_parallel(compiled, input_string, workers=None, chunk_size=None):
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, -(-len(input_string) // workers))
+
+    starts = range(0, len(input_string), chunk_size)
+    chunks = [input_string[start:start + chunk_size] for start in starts]
+
+    # Only the first chunk has a known start state, the rest speculate from every state
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(compiled,)) as pool:
+        futures = [pool.submit(_worker_outcomes, chunk, [compiled.start] if index == 0 else None) for index, chunk in enumerate(chunks)]
+
+        # Compose the per-chunk mappings in input order
+        current_state = compiled.start
+        for start, chunk, future in zip(starts, chunks, futures):
+            outcomes = future.result()
+            walked_rest = outcomes is None
+            if walked_rest:
+                # Speculation gave up, walk the rest of the input from the state reached so far
+                for pending in futures:
+                    pending.cancel()
+                chunk = input_string[start:]
+                outcomes = chunk_outcomes(compiled, chunk, [current_state])
+            outcome = outcomes[current_state]
+            if outcome[0] == "state":
+                current_state = outcome[1]
+                if walked_rest:
+                    break
+                continue
+
+            for pending in futures:
+                pending.cancel()
+            reason, offset, state = outcome
+            if reason == "invalid":
+                return "REJECT", f"Invalid symbol '{chunk[offset]}'"
+            return "REJECT", f"No transition for '{chunk[offset]}' in state '{compiled.state_names[state]}'"
+
+    if compiled.accepting[current_state]:
+        return "ACCEPT", "String accepted"
+    return "REJECT", "String rejected"
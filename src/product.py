@@ -0,0 +1,111 @@
+from automaton import DFA
+from compiled import DEAD
+
+class ProductDFA:
+    # Runs N DFAs over one input in a single pass. Product states are tuples of component state ids
+    # (DEAD once a component rejects) built on demand, with rows kept in a bounded cache like LazyDFA.
+
+    def __init__(self, dfas, max_states=4096):
+        if not dfas:
+            raise ValueError("A product needs at least one DFA")
+        self.components = [dfa.compile() if isinstance(dfa, DFA) else dfa for dfa in dfas]
+        self.max_states = max_states
+        self.start = tuple(component.start for component in self.components)
+        self.dead = (DEAD,) * len(self.components)
+
+        # Each product state maps to its row, symbol -> (next state, next row)
+        self.rows = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+
+    def __len__(self):
+        return len(self.components)
+
+    def _move(self, state, symbol):
+        next_state = []
+        for component, current in zip(self.components, state):
+            symbol_id = component.symbol_ids.get(symbol)
+            if current == DEAD or symbol_id is None:
+                next_state.append(DEAD)
+            else:
+                next_state.append(component.table[current * component.num_symbols + symbol_id])
+        return tuple(next_state)
+
+    def _row(self, state):
+        row = self.rows.get(state)
+        if row is None:
+            row = self.rows[state] = {}
+        return row
+
+    def run(self, input_string):
+        # Product state reached after the input, stopping early once every component has rejected
+        state = self.start
+        row = self._row(state)
+        for symbol in input_string:
+            cached = row.get(symbol)
+            if cached is not None:
+                self.hits += 1
+                state, row = cached
+            else:
+                self.misses += 1
+                next_state = self._move(state, symbol)
+                if next_state not in self.rows and len(self.rows) >= self.max_states:
+                    self.flush()
+                next_row = self._row(next_state)
+                row[symbol] = (next_state, next_row)
+                state, row = next_state, next_row
+
+            if state == self.dead:
+                break
+        return state
+
+    def evaluate(self, input_string):
+        # Accept/reject vector, one bool per component in the order they were given
+        state = self.run(input_string)
+        return [current != DEAD and bool(component.accepting[current]) for component, current in zip(self.components, state)]
+
+    def flush(self):
+        if self.rows:
+            self.flushes += 1
+        self.rows = {}
+
+    def cache_info(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "flushes": self.flushes,
+            "states": len(self.rows),
+            "max_states": self.max_states
+        }
+
+    def union(self, indices=None):
+        return ProductView(self, any, indices)
+
+    def intersection(self, indices=None):
+        return ProductView(self, all, indices)
+
+    def component(self, index):
+        return ProductView(self, all, [index])
+
+class ProductView:
+    # Boolean combination of some components, used like a DFA through process_string
+
+    def __init__(self, product, combine, indices=None, negated=False):
+        self.product = product
+        self.combine = combine
+        self.indices = list(range(len(product))) if indices is None else list(indices)
+        self.negated = negated
+
+    def accepts(self, input_string):
+        vector = self.product.evaluate(input_string)
+        return self.combine(vector[index] for index in self.indices) != self.negated
+
+    def complement(self):
+        return ProductView(self.product, self.combine, self.indices, not self.negated)
+
+    def process_string(self, input_string):
+        if self.accepts(input_string):
+            return "ACCEPT", "String accepted"
+        return "REJECT", "String rejected"
@@ -0,0 +1,221 @@
+import threading
+from collections import OrderedDict
+
+from automaton import DFA, NFA
+
+class Parser:
+    # Parser producing a tuple AST:
+    # ("empty",) ("literal", symbol) ("concat", items) ("union", options) ("star", item) ("plus", item) ("optional", item)
+    # Open groups are kept on an explicit stack, so nesting depth is not bounded by the recursion limit.
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.position = 0
+
+    def parse(self):
+        pattern = self.pattern
+
+        # Matching is always against the whole string, so leading ^ and trailing $ are accepted and ignored
+        end = len(pattern)
+        if pattern.startswith("^"):
+            self.position = 1
+        if end > self.position and pattern.endswith("$") and not self._escaped(end - 1):
+            end -= 1
+        self.end = end
+
+        # Each open group keeps its finished options and the items of the option being read
+        groups = []
+        options, items = [], []
+        while self.position < self.end:
+            symbol = pattern[self.position]
+            self.position += 1
+
+            if symbol == "(":
+                groups.append((options, items))
+                options, items = [], []
+            elif symbol == ")":
+                if not groups:
+                    raise ValueError(f"Unbalanced ')' at position {self.position - 1} in regular expression")
+                node = self._union(options, items)
+                options, items = groups.pop()
+                items.append(node)
+            elif symbol == "|":
+                options.append(self._concat(items))
+                items = []
+            elif symbol in ("*", "+", "?"):
+                if not items:
+                    raise ValueError(f"Nothing to repeat before '{symbol}' at position {self.position - 1} in regular expression")
+                items[-1] = ({"*": "star", "+": "plus", "?": "optional"}[symbol], items[-1])
+            elif symbol == "\\":
+                if self.position >= self.end:
+                    raise ValueError("Dangling '\\' at the end of regular expression")
+                items.append(("literal", pattern[self.position]))
+                self.position += 1
+            elif symbol in ("^", "$"):
+                raise ValueError(f"'{symbol}' is only supported at the edges of a regular expression")
+            else:
+                items.append(("literal", symbol))
+
+        if groups:
+            raise ValueError("Missing ')' in regular expression")
+        return self._union(options, items)
+
+    def _escaped(self, index):
+        backslashes = 0
+        while index > 0 and self.pattern[index - 1] == "\\":
+            backslashes += 1
+            index -= 1
+        return backslashes % 2 == 1
+
+    def _concat(self, items):
+        if not items:
+            return ("empty",)
+        return items[0] if len(items) == 1 else ("concat", items)
+
+    def _union(self, options, items):
+        options = options + [self._concat(items)]
+        return options[0] if len(options) == 1 else ("union", options)
+
+def parse_regex(pattern):
+    return Parser(pattern).parse()
+
+def thompson(node):
+    # Thompson construction: every node becomes a fragment with one entry and one exit state.
+    # Nodes are visited with an explicit stack, entered to number their states and finished once
+    # the fragments of their children are built.
+    edges = []
+    counter = 0
+    fragments = []
+    stack = [(node, None)]
+
+    while stack:
+        node, entry = stack.pop()
+        kind = node[0]
+
+        if entry is None:
+            start = f"n{counter}"
+            counter += 1
+            if kind == "empty":
+                fragments.append((start, start))
+                continue
+            end = None
+            if kind != "concat":
+                end = f"n{counter}"
+                counter += 1
+            if kind == "literal":
+                edges.append((start, node[1], end))
+                fragments.append((start, end))
+                continue
+            stack.append((node, (start, end)))
+            stack.extend((child, None) for child in reversed(node[1] if kind in ("concat", "union") else [node[1]]))
+            continue
+
+        # The fragments of the node's children are the last ones built, in order
+        start, end = entry
+        count = len(node[1]) if kind in ("concat", "union") else 1
+        parts = fragments[len(fragments) - count:]
+        del fragments[len(fragments) - count:]
+
+        if kind == "concat":
+            current = start
+            for item_start, item_end in parts:
+                edges.append((current, "<EPSILON>", item_start))
+                current = item_end
+            fragments.append((start, current))
+            continue
+
+        if kind == "union":
+            for option_start, option_end in parts:
+                edges.append((start, "<EPSILON>", option_start))
+                edges.append((option_end, "<EPSILON>", end))
+        else:
+            item_start, item_end = parts[0]
+            edges.append((start, "<EPSILON>", item_start))
+            edges.append((item_end, "<EPSILON>", end))
+            if kind in ("star", "optional"):
+                edges.append((start, "<EPSILON>", end))
+            if kind in ("star", "plus"):
+                edges.append((item_end, "<EPSILON>", item_start))
+        fragments.append((start, end))
+
+    start, end = fragments.pop()
+    return NFA.from_edges((f"n{index}" for index in range(counter)), edges, start, [end])
+
+def renumber(dfa):
+    # Rename states q0, q1, ... in breadth-first order over the sorted alphabet
+    alphabet = sorted(dfa.alphabet)
+    names = {dfa.start_state: "q0"}
+    queue = [dfa.start_state]
+    for state in queue:
+        transitions = dfa.states[state].transitions
+        for symbol in alphabet:
+            next_state = transitions.get(symbol)
+            if next_state is not None and next_state not in names:
+                names[next_state] = f"q{len(names)}"
+                queue.append(next_state)
+
+    edges = [(names[state], symbol, names[next_state]) for state in queue for symbol, next_state in dfa.states[state].transitions.items()]
+    renamed = DFA.from_edges(names.values(), edges, "q0", [names[state] for state in dfa.accept_states if state in names], dfa.alphabet)
+    renamed.build_info = dfa.build_info
+    return renamed
+
+def compile_regex(pattern):
+    # Parse, build a Thompson NFA, determinize and minimize
+    nfa = thompson(parse_regex(pattern))
+    return renumber(nfa.to_dfa().minimize())
+
+class RegexCache:
+    # Least recently used cache of compiled patterns, like the one behind re.compile.
+    # Cached automata are frozen so the same instance can be handed to every caller.
+
+    def __init__(self, max_size=128):
+        if max_size < 0:
+            raise ValueError("Cache size must not be negative")
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, pattern):
+        with self.lock:
+            dfa = self.entries.get(pattern)
+            if dfa is not None:
+                self.entries.move_to_end(pattern)
+                self.hits += 1
+                return dfa
+            self.misses += 1
+
+        # Compile outside the lock, invalid patterns raise and are never cached
+        dfa = compile_regex(pattern).freeze()
+
+        with self.lock:
+            if self.max_size:
+                dfa = self.entries.setdefault(pattern, dfa)
+                self.entries.move_to_end(pattern)
+                self._evict()
+        return dfa
+
+    def _evict(self):
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def resize(self, max_size):
+        if max_size < 0:
+            raise ValueError("Cache size must not be negative")
+        with self.lock:
+            self.max_size = max_size
+            self._evict()
+
+    def purge(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self.entries), "max_size": self.max_size}
+
+# Shared by load_from_regex
+regex_cache = RegexCache()
@@ -0,0 +1,136 @@
+import sys
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+
+from automaton import State
+from loader import PeakMemory, load_cached, load_from_regex
+
+def approximate_size(automaton):
+    # Deep sys.getsizeof over the containers that make up an automaton, shared objects counted once
+    seen = set()
+    total = 0
+    stack = [automaton.states, automaton.alphabet, automaton.accept_states, getattr(automaton, "_closures", None)]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+
+        if isinstance(obj, (dict, MappingProxyType)):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif isinstance(obj, State):
+            stack.extend((obj.name, obj.transitions, obj.edges))
+    return total
+
+def load_source(source):
+    # source is ("file", path) or ("regex", pattern), files go through the compile cache so reloads are cheap.
+    # Patterns skip the shared regex cache, which would keep an unloaded entry alive and be counted once per name.
+    kind, value = source
+    if kind == "regex":
+        return load_from_regex(value, cached=False)
+    return load_cached(value)
+
+class RegistryEntry:
+    def __init__(self, name, source):
+        self.name = name
+        self.source = source
+        self.automaton = None
+
+        # Measured on the last load and kept while the automaton is unloaded
+        self.type = None
+        self.states = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.peak_bytes = None
+        self.loads = 0
+
+class Registry:
+    # Automata loaded under names. With a memory budget the least recently used ones are unloaded
+    # and reloaded from their source the next time they are asked for.
+
+    def __init__(self, max_bytes=None, loader=load_source):
+        self.max_bytes = max_bytes
+        self.loader = loader
+        self.entries = OrderedDict()
+        self.unloads = 0
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def add(self, name, source, trace_memory=False):
+        # Load first so a failing source leaves any previous entry under this name untouched
+        entry = RegistryEntry(name, source)
+        self._load(entry, trace_memory)
+        self.entries.pop(name, None)
+        self.entries[name] = entry
+        self._enforce_budget(keep=name)
+        return entry.automaton
+
+    def get(self, name):
+        entry = self.entries[name]
+        self.entries.move_to_end(name)
+        if entry.automaton is None:
+            self._load(entry)
+            self._enforce_budget(keep=name)
+        return entry.automaton
+
+    def _load(self, entry, trace_memory=False):
+        # With trace_memory the peak Python allocation of this load is measured as well, see PeakMemory
+        started = time.perf_counter()
+        with PeakMemory(trace_memory) as memory:
+            automaton = self.loader(entry.source)
+        entry.seconds = time.perf_counter() - started
+        entry.peak_bytes = memory.peak
+        entry.automaton = automaton
+        entry.type = type(automaton).__name__
+        entry.states = len(automaton.states)
+        entry.bytes = approximate_size(automaton)
+        entry.loads += 1
+
+    def _enforce_budget(self, keep=None):
+        if self.max_bytes is None:
+            return
+        for entry in list(self.entries.values()):
+            if self.total_bytes() <= self.max_bytes:
+                break
+            if entry.automaton is not None and entry.name != keep:
+                self.unload(entry.name)
+
+    def set_budget(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._enforce_budget()
+
+    def unload(self, name):
+        # Drop the automaton but keep its source for a later reload
+        entry = self.entries[name]
+        if entry.automaton is not None:
+            entry.automaton = None
+            self.unloads += 1
+
+    def remove(self, name):
+        del self.entries[name]
+
+    def total_bytes(self):
+        return sum(entry.bytes for entry in self.entries.values() if entry.automaton is not None)
+
+    def listing(self):
+        # One row per entry, least recently used first
+        rows = []
+        for entry in self.entries.values():
+            rows.append({
+                "name": entry.name,
+                "source": entry.source,
+                "loaded": entry.automaton is not None,
+                "type": entry.type,
+                "states": entry.states,
+                "bytes": entry.bytes,
+                "seconds": entry.seconds,
+                "peak_bytes": entry.peak_bytes,
+                "loads": entry.loads,
+            })
+        return rows
@@ -0,0 +1,198 @@
+from automaton import DFA, NFA
+from compiled import DEAD
+
+# Subset constructions above this many states fall back to simulating the NFA as a set of states
+MAX_SEARCH_STATES = 1 << 16
+
+# Forward runs record their state at every index for MERGE_WINDOW symbols, then at every second index
+# for as many, every fourth and so on, see Searcher
+MERGE_WINDOW = 16
+
+def automaton_edges(automaton):
+    # (state, symbol, next_state) for every transition, epsilon moves use the "<EPSILON>" symbol
+    for state, state_obj in automaton.states.items():
+        if isinstance(automaton, DFA):
+            yield from ((state, symbol, next_state) for symbol, next_state in state_obj.transitions.items())
+            continue
+        for next_state in state_obj.transitions.get("epsilon_transitions", ()):
+            yield state, "<EPSILON>", next_state
+        for symbol, next_states in (state_obj.edges or {}).items():
+            yield from ((state, symbol, next_state) for next_state in next_states)
+
+def reverse_prefix_nfa(automaton):
+    # NFA for Σ*·reverse(L): read right to left, it accepts exactly where a match of L starts
+    alphabet = automaton.alphabet - {"<EPSILON>"}
+    prefix = ("prefix",)
+    edges = [(("state", next_state), symbol, ("state", state)) for state, symbol, next_state in automaton_edges(automaton)]
+    edges.extend((prefix, symbol, prefix) for symbol in alphabet)
+    edges.extend((prefix, "<EPSILON>", ("state", state)) for state in automaton.accept_states)
+
+    states = [prefix] + [("state", state) for state in automaton.states]
+    return NFA.from_edges(states, edges, prefix, [("state", automaton.start_state)], alphabet | {"<EPSILON>"})
+
+class TableEngine:
+    # Runs a compiled DFA, states are table ids
+    def __init__(self, compiled):
+        self.compiled = compiled
+
+    def mark_starts(self, text):
+        # One right-to-left pass, marks[i] is set when some match starts at i
+        compiled = self.compiled
+        symbol_ids = compiled.symbol_ids
+        table = compiled.table
+        num_symbols = compiled.num_symbols
+        accepting = compiled.accepting
+        restart = compiled.start
+
+        marks = bytearray(len(text) + 1)
+        state = restart
+        marks[len(text)] = accepting[state]
+        for index in range(len(text) - 1, -1, -1):
+            symbol_id = symbol_ids.get(text[index])
+            if symbol_id is None:
+                # No match can span a symbol outside the alphabet
+                state = restart
+            else:
+                state = table[state * num_symbols + symbol_id]
+                if state == DEAD:
+                    state = restart
+            if accepting[state]:
+                marks[index] = 1
+        return marks
+
+    def walk(self, text, start, memo, overlapping):
+        # Anchored run from start up to where it dies, the text ends or it reaches a pair already in memo.
+        # Returns the (index, state) pairs to record, see MERGE_WINDOW, and the end of the longest match.
+        # Without overlapping the search resumes at the end of the match, so pairs up to an accept are
+        # dropped and the recording schedule restarts there.
+        compiled = self.compiled
+        symbol_ids = compiled.symbol_ids
+        table = compiled.table
+        num_symbols = compiled.num_symbols
+        accepting = compiled.accepting
+
+        checkpoints = []
+        end = None
+        origin, step, next_record = start, 1, start
+        state = compiled.start
+        for index in range(start, len(text) + 1):
+            row = memo.get(index)
+            if row is not None and state in row:
+                joined = row[state]
+                return checkpoints, end if joined is None else joined
+            if index == next_record:
+                checkpoints.append((index, state))
+                if index - origin >= MERGE_WINDOW * step:
+                    step *= 2
+                next_record = index + step
+            if accepting[state]:
+                end = index
+                if not overlapping:
+                    checkpoints.clear()
+                    origin, step, next_record = index, 1, index + 1
+            if index == len(text):
+                break
+            symbol_id = symbol_ids.get(text[index])
+            if symbol_id is None:
+                break
+            state = table[state * num_symbols + symbol_id]
+            if state == DEAD:
+                break
+        return checkpoints, end
+
+class SetEngine:
+    # Simulates an NFA directly when its subset construction would be too large
+    def __init__(self, nfa):
+        self.nfa = nfa
+
+    def mark_starts(self, text):
+        nfa = self.nfa
+        restart = nfa.epsilon_closure(nfa.start_state)
+        marks = bytearray(len(text) + 1)
+        active = restart
+        marks[len(text)] = not nfa.accept_states.isdisjoint(active)
+        for index in range(len(text) - 1, -1, -1):
+            active = nfa._step(active, text[index]) or restart
+            if not nfa.accept_states.isdisjoint(active):
+                marks[index] = 1
+        return marks
+
+    def walk(self, text, start, memo, overlapping):
+        nfa = self.nfa
+        checkpoints = []
+        end = None
+        origin, step, next_record = start, 1, start
+        active = frozenset(nfa.epsilon_closure(nfa.start_state))
+        for index in range(start, len(text) + 1):
+            row = memo.get(index)
+            if row is not None and active in row:
+                joined = row[active]
+                return checkpoints, end if joined is None else joined
+            if index == next_record:
+                checkpoints.append((index, active))
+                if index - origin >= MERGE_WINDOW * step:
+                    step *= 2
+                next_record = index + step
+            if not nfa.accept_states.isdisjoint(active):
+                end = index
+                if not overlapping:
+                    checkpoints.clear()
+                    origin, step, next_record = index, 1, index + 1
+            if index == len(text):
+                break
+            active = frozenset(nfa._step(active, text[index]))
+            if not active:
+                break
+        return checkpoints, end
+
+def engine(automaton, max_states):
+    if isinstance(automaton, DFA):
+        return TableEngine(automaton.compile())
+    try:
+        return TableEngine(automaton.to_dfa(max_states).compile())
+    except ValueError:
+        return SetEngine(automaton)
+
+class Searcher:
+    # Unanchored search: a reverse scan with Σ*·reverse(L) marks every position where a match starts,
+    # then each reported start is extended forwards with the anchored automaton to its longest match.
+    # Extensions share a memo of (index, state) -> longest end, so a run that reaches a pair an earlier
+    # run went through stops there and the text is walked at most once per state instead of once per start.
+    # Runs only record pairs at indices that get sparser the further they are from where the run started,
+    # see MERGE_WINDOW: runs that merged stay merged, so a later run still stops at the next recorded pair.
+    # Build one Searcher to reuse the constructions across texts.
+
+    def __init__(self, automaton, max_states=MAX_SEARCH_STATES):
+        self.empty = automaton.start_state is None
+        if not self.empty:
+            self.forward = engine(automaton, max_states)
+            self.scanner = engine(reverse_prefix_nfa(automaton), max_states)
+
+    def longest(self, text, start, memo, overlapping=True):
+        # End of the longest match starting at start, or None
+        checkpoints, end = self.forward.walk(text, start, memo, overlapping)
+        for index, state in checkpoints:
+            # The run is one path, so from each of its pairs the longest match ends at its last accept
+            memo.setdefault(index, {})[state] = end if end is not None and end >= index else None
+        return end
+
+    def finditer(self, text, overlapping=False):
+        # Leftmost-longest non-overlapping (start, end) spans, or with overlapping=True the longest match at every start
+        if self.empty:
+            return
+        marks = self.scanner.mark_starts(text)
+        memo = {}
+        position = 0
+        while (start := marks.find(1, position)) != -1:
+            end = self.longest(text, start, memo, overlapping)
+            yield start, end
+            next_position = start + 1 if overlapping or end == start else end
+
+            # Later runs start at or after next_position, so the rows before it are never read again
+            for index in range(position, next_position):
+                memo.pop(index, None)
+            position = next_position
+
+    def search(self, text):
+        # First leftmost-longest span, or None
+        return next(self.finditer(text), None)
@@ -0,0 +1,281 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from automaton import NFA
+from corpus import LatencyHistogram
+from loader import default_cache, load_cached, load_from_regex
+
+# Line-delimited JSON protocol, one object per line in each direction:
+#   {"id": 1, "op": "load", "name": "dfa", "path": "assets/data.json"}
+#   {"id": 2, "op": "regex", "name": "re", "pattern": "(a|b)*abb"}
+#   {"id": 3, "op": "process", "name": "dfa", "input": "aab"}
+#   {"id": 4, "op": "stats"}
+# Every response echoes the id and carries "ok", the latency in "seconds", and either the
+# result fields or an "error" message. Responses can come back out of order.
+
+DEFAULT_NAME = "default"
+
+# Automata loaded inside each pool worker, keyed by how they were loaded
+_worker_automata = {}
+
+def file_spec(path, determinize=False, minimize=False):
+    # The content hash makes a reloaded file a different spec, so workers never reuse the old automaton
+    return ("file", path, determinize, minimize, default_cache().key(path, determinize, minimize))
+
+def regex_spec(pattern):
+    return ("regex", pattern)
+
+def load_spec(spec):
+    # spec is ("file", path, determinize, minimize, content key) or ("regex", pattern)
+    if spec[0] == "regex":
+        return load_from_regex(spec[1])
+    _, path, determinize, minimize, key = spec
+    automaton = load_cached(path, determinize, minimize, quiet=True)
+    if default_cache().key(path, determinize, minimize) != key:
+        raise ValueError(f"'{path}' changed since it was loaded, load it again")
+    return automaton
+
+def _worker_process(spec, input_string):
+    # Workers load every automaton once (through the compile cache for files) and keep it
+    automaton = _worker_automata.get(spec)
+    if automaton is None:
+        automaton = _worker_automata[spec] = load_spec(spec)
+    return process(automaton, input_string)
+
+def process(automaton, input_string):
+    if isinstance(automaton, NFA):
+        return automaton.process_string(input_string, automaton.start_state)
+    return automaton.process_string(input_string)
+
+def string_field(request, key, default=None):
+    # Fields are checked up front so bad types become error replies instead of TypeErrors deep in a handler
+    if key not in request and default is not None:
+        return default
+    value = request[key]
+    if not isinstance(value, str):
+        raise ValueError(f"'{key}' must be a string")
+    return value
+
+class AutomataServer:
+    # Inputs at least this long are run in the worker pool instead of on the event loop
+    nfa_offload_threshold = 1 << 10
+    dfa_offload_threshold = 1 << 16
+
+    def __init__(self, workers=None, max_pending=64, max_line=1 << 24, executor=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = executor
+        self.max_line = max_line
+
+        # Backpressure: a connection stops being read while it has max_pending requests in flight,
+        # and at most two offloaded runs per worker are queued at any time
+        self.max_pending = max_pending
+        self.offload_slots = asyncio.Semaphore(self.workers * 2)
+
+        self.automata = {}
+        self.latency = {}
+        self.servers = []
+
+    def pool(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self.executor
+
+    async def handle(self, request):
+        # Answer one request, never raising: failures become {"ok": false, "error": ...}
+        started = time.perf_counter()
+        op = request.get("op") if isinstance(request, dict) else None
+        try:
+            handler = {"load": self.load, "regex": self.regex, "process": self.process, "stats": self.stats}.get(op)
+            if handler is None:
+                raise ValueError(f"Unknown op '{op}'")
+            response = {"ok": True, **await handler(request)}
+        except KeyError as error:
+            response = {"ok": False, "error": f"Missing field {error}"}
+        except (ValueError, OSError) as error:
+            response = {"ok": False, "error": str(error)}
+        except Exception as error:
+            # Anything else is a bug, but the client still gets an answer instead of waiting forever
+            response = {"ok": False, "error": f"Internal error: {type(error).__name__}: {error}"}
+
+        seconds = time.perf_counter() - started
+        if op in ("load", "regex", "process", "stats"):
+            self.latency.setdefault(op, LatencyHistogram()).add(seconds)
+        if isinstance(request, dict) and "id" in request:
+            response["id"] = request["id"]
+        response["seconds"] = seconds
+        return response
+
+    async def load(self, request):
+        path = string_field(request, "path")
+        determinize, minimize = bool(request.get("determinize")), bool(request.get("minimize"))
+        return await self._install(string_field(request, "name", DEFAULT_NAME), file_spec, path, determinize, minimize)
+
+    async def regex(self, request):
+        return await self._install(string_field(request, "name", DEFAULT_NAME), regex_spec, string_field(request, "pattern"))
+
+    async def _install(self, name, make_spec, *arguments):
+        # Hashing and loading read files and compile, so they run on a thread to keep the loop responsive
+        def install():
+            spec = make_spec(*arguments)
+            return spec, load_spec(spec)
+
+        spec, automaton = await asyncio.get_running_loop().run_in_executor(None, install)
+        self.automata[name] = (spec, automaton)
+        return {"name": name, "type": type(automaton).__name__, "states": len(automaton.states)}
+
+    async def process(self, request):
+        name = string_field(request, "name", DEFAULT_NAME)
+        if name not in self.automata:
+            raise ValueError(f"No automaton named '{name}'")
+        input_string = string_field(request, "input")
+
+        spec, automaton = self.automata[name]
+        threshold = self.nfa_offload_threshold if isinstance(automaton, NFA) else self.dfa_offload_threshold
+        if len(input_string) < threshold:
+            result, message = process(automaton, input_string)
+        else:
+            async with self.offload_slots:
+                result, message = await asyncio.get_running_loop().run_in_executor(self.pool(), _worker_process, spec, input_string)
+        return {"result": result, "message": message}
+
+    async def stats(self, request):
+        return {
+            "automata": {name: type(automaton).__name__ for name, (_, automaton) in self.automata.items()},
+            "latency": {op: {"count": histogram.count, "p50": histogram.percentile(50), "p99": histogram.percentile(99)} for op, histogram in self.latency.items()},
+        }
+
+    async def serve_connection(self, reader, writer):
+        pending = asyncio.Semaphore(self.max_pending)
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def respond(request):
+            try:
+                response = await self.handle(request)
+                async with write_lock:
+                    writer.write(json.dumps(response).encode() + b"\n")
+                    await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                pending.release()
+
+        try:
+            while True:
+                await pending.acquire()
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Longer than max_line, the stream cannot be resynchronised
+                    pending.release()
+                    async with write_lock:
+                        writer.write(json.dumps({"ok": False, "error": "Request line too long"}).encode() + b"\n")
+                    break
+                if not line:
+                    pending.release()
+                    break
+                if not line.strip():
+                    pending.release()
+                    continue
+
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    request = {"op": None}
+                task = asyncio.create_task(respond(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.gather(*tasks)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8765, path=None):
+        if path is not None:
+            server = await asyncio.start_unix_server(self.serve_connection, path, limit=self.max_line)
+        else:
+            server = await asyncio.start_server(self.serve_connection, host, port, limit=self.max_line)
+        self.servers.append(server)
+        return server
+
+    async def close(self):
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        self.servers = []
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+class Client:
+    # Minimal asyncio client, requests can be issued concurrently over one connection
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.ids = itertools.count(1)
+        self.waiting = {}
+        self.receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=8765, path=None, limit=1 << 24):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path, limit=limit)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=limit)
+        return cls(reader, writer)
+
+    async def _receive(self):
+        while line := await self.reader.readline():
+            response = json.loads(line)
+            future = self.waiting.pop(response.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+        for future in self.waiting.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Connection closed by the server"))
+
+    async def request(self, op, **fields):
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[request_id] = future
+        self.writer.write(json.dumps({"id": request_id, "op": op, **fields}).encode() + b"\n")
+        await self.writer.drain()
+        return await future
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.receiver.cancel()
+
+async def serve(host, port, path, workers):
+    server = AutomataServer(workers)
+    listener = await server.start(host, port, path)
+    print(f"Serving on {path or f'{host}:{port}'}", flush=True)
+    try:
+        await listener.serve_forever()
+    finally:
+        await server.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve automata queries as line-delimited JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, help="processes for long runs (default: one per CPU)")
+    options = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(options.host, options.port, options.unix, options.workers))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
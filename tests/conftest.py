@@ -0,0 +1,6 @@
+import pytest
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    # Keep the compile cache used by the REPL out of the user's home directory
+    monkeypatch.setenv("AUTOMATA_CACHE_DIR", str(tmp_path / "cache"))
@@ -1,6 +1,7 @@
 from unittest.mock import patch
 from io import StringIO
 import json
+import re
 import pytest
 import os
 import sys
@@ -39,6 +40,13 @@ def test_main_load_json_valid_command():
     # Eliminar el archivo de prueba después de usarlo
     os.remove(test_file_path)
 
+def test_main_load_json_cached():
+    with patch("builtins.input", side_effect=["load --input=file assets/data.json", "load --input=file assets/data.json", "process aa", "exit"]), patch("sys.stdout", new=StringIO()) as output:
+        main()
+        output_text = output.getvalue()
+        assert output_text.count("Loading DFA from JSON...") == 2
+        assert "ACCEPT String accepted" in output_text
+
 def test_main_process_string_dfa_verbose():
     with patch("builtins.input", side_effect=["load --input=file assets/data.json", "process aa --verbose", "exit"]), patch("sys.stdout", new=StringIO()) as output:
         main()
@@ -60,6 +68,14 @@ def test_main_process_string_nfa_verbose():
         assert "q0 --(a)--> q1" in output_text
         assert "q1 --(ε)--> q1" in output_text
 
+def test_main_process_string_nfa_verbose_runs_once():
+    # The traced run gives the result too, the NFA is not simulated a second time
+    commands = ["load --input=file assets/data_nfa.json", "process aε --verbose", "exit"]
+    with patch("builtins.input", side_effect=commands), patch("sys.stdout", new=StringIO()) as output, patch.object(NFA, "process_string", side_effect=AssertionError):
+        main()
+        assert "ACCEPT String accepted" in output.getvalue()
+        assert "q0 --(a)--> q1" in output.getvalue()
+
 def test_main_process_string_nfa_verbose_failure():
     with patch("builtins.input", side_effect=["load --input=file assets/data.json", "process ab --verbose", "exit"]), patch("sys.stdout", new=StringIO()) as output:
         main()
@@ -78,6 +94,61 @@ def test_main_process_string_nfa_failure():
         main()
         assert "REJECT No transition for 'ε' in state 'q0'" in output.getvalue()
 
+def test_main_process_file_dfa(tmp_path):
+    file_path = tmp_path / "big.bin"
+    file_path.write_bytes(b"a" * 100000)
+    with patch("builtins.input", side_effect=["load --input=file assets/data.json", f"process --input=file {file_path}", "exit"]), patch("sys.stdout", new=StringIO()) as output:
+        main()
+        output_text = output.getvalue()
+        assert "ACCEPT String accepted" in output_text
+        assert "Scanned 100000 bytes" in output_text
+
+def test_main_process_file_dfa_reject(tmp_path):
+    file_path = tmp_path / "big.bin"
+    file_path.write_bytes(b"aaab")
+    with patch("builtins.input", side_effect=["load --input=file assets/data.json", f"process --input=file {file_path}", "exit"]), patch("sys.stdout", new=StringIO()) as output:
+        main()
+        output_text = output.getvalue()
+        assert "REJECT Invalid symbol 'b'" in output_text
+        assert "Rejected at byte offset 3" in output_text
+
+def test_main_process_file_nfa(tmp_path):
+    file_path = tmp_path / "big.bin"
+    file_path.write_bytes(b"a")
+    with patch("builtins.input", side_effect=["load --input=file assets/data_nfa.json", f"process --input=file {file_path}", "exit"]), patch("sys.stdout", new=StringIO()) as output:
+        main()
+        assert "ACCEPT String accepted" in output.getvalue()
+
+def test_main_process_corpus(tmp_path):
+    corpus_path = tmp_path / "corpus.txt"
+    corpus_path.write_text("\n".join(["a" * (i % 5) + ("b" if i % 7 == 0 else "") for i in range(3000)]) + "\n")
+    output_path = tmp_path / "results.ndjson"
+    with patch("builtins.input", side_effect=["load --input=file assets/data.json", f"process --corpus={corpus_path} --workers=2 --output={output_path}", "exit"]), patch("sys.stdout", new=StringIO()) as output:
+        main()
+        output_text = output.getvalue()
+        assert "Processed 3000 strings" in output_text
+        assert "strings/s" in output_text
+
+    automaton = load_from_json(json.load(open("assets/data.json")))
+    lines = corpus_path.read_text().splitlines()
+    records = [json.loads(record) for record in output_path.read_text().splitlines()]
+    assert len(records) == len(lines)
+    for number, (line, record) in enumerate(zip(lines, records), start=1):
+        assert record["line"] == number
+        assert record["input"] == line
+        assert (record["result"], record["message"]) == automaton.process_string(line)
+
+def test_main_process_corpus_tsv_nfa(tmp_path):
+    corpus_path = tmp_path / "corpus.txt"
+    corpus_path.write_text("a\naε\nε\n")
+    with patch("builtins.input", side_effect=["load --input=file assets/data_nfa.json", f"process --corpus={corpus_path} --workers=1 --format=tsv", "exit"]), patch("sys.stdout", new=StringIO()) as output:
+        main()
+        output_text = output.getvalue()
+        assert "1\ta\tACCEPT\tString accepted" in output_text
+        assert "2\taε\tACCEPT\tString accepted" in output_text
+        assert "3\tε\tREJECT\tNo transition for 'ε' in state 'q0'" in output_text
+        assert "Processed 3 strings: 2 accepted, 1 rejected" in output_text
+
 def test_main_process_string_no_automaton_loaded():
     with patch("builtins.input", side_effect=["process aa", "exit"]), patch("sys.stdout", new=StringIO()) as output:
         main()
@@ -88,6 +159,83 @@ def test_main_regex():
         main()
         assert output.getvalue().strip() == "Loaded DFA from Regular Expression."
 
+def test_main_regex_invalid():
+    with patch("builtins.input", side_effect=["regex test (ab", "exit"]), patch("sys.stdout", new=StringIO()) as output:
+        main()
+        assert output.getvalue().strip() == "Missing ')' in regular expression"
+
+def test_main_stats():
+    commands = ["load --input=file assets/data.json", "stats", "stats on", "process aa", "process ab", "stats", "stats reset", "stats", "stats off", "stats", "exit"]
+    with patch("builtins.input", side_effect=commands), patch("sys.stdout", new=StringIO()) as output:
+        main()
+        output_text = output.getvalue()
+        assert output_text.count("Statistics are off, enable them with 'stats on'.") == 2
+        assert "Statistics on." in output_text
+        assert "calls: 2" in output_text
+        assert "calls: 0" in output_text
+        assert "Statistics reset." in output_text
+
+def test_main_stats_off_applies_to_every_automaton():
+    commands = ["load --name=dfa --input=file assets/data.json", "regex abb (a|b)*abb", "stats on", "process babb", "use dfa", "process aa",
+                "stats off", "use abb", "stats", "process babb", "stats", "exit"]
+    with patch("builtins.input", side_effect=commands), patch("sys.stdout", new=StringIO()) as output:
+        main()
+        output_text = output.getvalue()
+        assert output_text.count("Statistics are off, enable them with 'stats on'.") == 2
+        assert "calls: " not in output_text
+
+def test_main_stats_no_automaton_loaded():
+    with patch("builtins.input", side_effect=["stats", "exit"]), patch("sys.stdout", new=StringIO()) as output:
+        main()
+        assert output.getvalue().strip() == "No automaton loaded."
+
+def test_main_registry():
+    commands = ["load --name=dfa --input=file assets/data.json", "load --name=nfa --input=file assets/data_nfa.json", "regex abb (a|b)*abb",
+                "process --with=dfa aa", "process --with=nfa aε", "process babb", "use dfa", "process aa", "use missing", "process --with=missing a", "list", "exit"]
+    with patch("builtins.input", side_effect=commands), patch("sys.stdout", new=StringIO()) as output:
+        main()
+        lines = output.getvalue().splitlines()
+        assert lines.count("ACCEPT String accepted") == 4
+        assert "Using dfa." in lines
+        assert lines.count("No automaton named 'missing'.") == 2
+        assert any(line.startswith("* dfa: DFA, 2 states") for line in lines)
+        assert any(line.startswith("  nfa: NFA") for line in lines)
+        assert any(line.startswith("  abb: DFA, 4 states") for line in lines)
+        assert lines[-1].startswith("Total ") and lines[-1].endswith("budget none")
+
+def test_main_load_measure():
+    commands = ["load --name=dfa --input=file assets/data.json --measure", "list", "exit"]
+    with patch("builtins.input", side_effect=commands), patch("sys.stdout", new=StringIO()) as output:
+        main()
+        lines = output.getvalue().splitlines()
+        assert re.fullmatch(r"Loaded dfa in \d+\.\d{3}s, peak \d+(\.\d)? (B|KiB|MiB)", lines[1])
+        assert ", peak " in lines[2]
+
+def test_main_registry_budget():
+    commands = ["regex one (a|b)*abb", "regex two (ab|c)*d", "budget 1", "list", "process --with=one abb", "list", "unload one", "budget off", "budget x", "exit"]
+    with patch("builtins.input", side_effect=commands), patch("sys.stdout", new=StringIO()) as output:
+        main()
+        output_text = output.getvalue()
+        assert "Budget 1 B." in output_text
+        assert "one: DFA, 4 states" in output_text
+        assert output_text.count("(unloaded)") == 2 + 1
+        assert "ACCEPT String accepted" in output_text
+        assert "Unloaded one." in output_text
+        assert "Budget none." in output_text
+        assert "Invalid budget 'x'." in output_text
+
+def test_main_search(tmp_path):
+    file_path = tmp_path / "text.bin"
+    file_path.write_bytes(b"..abb..babb")
+    commands = ["regex abb (a|b)*abb", "search xxabbabbcaabb", "search abbabb --all", f"search --input=file {file_path}", "search --with=missing a", "exit"]
+    with patch("builtins.input", side_effect=commands), patch("sys.stdout", new=StringIO()) as output:
+        main()
+        lines = output.getvalue().splitlines()
+        assert lines[1:4] == ["Match at 2-8: 'abbabb'", "Match at 9-13: 'aabb'", "2 matches"]
+        assert lines[4:9] == ["Match at 0-6: 'abbabb'", "Match at 1-6: 'bbabb'", "Match at 2-6: 'babb'", "Match at 3-6: 'abb'", "4 matches"]
+        assert lines[9:12] == ["Match at 2-5", "Match at 7-11", "2 matches"]
+        assert lines[12] == "No automaton named 'missing'."
+
 def test_main_print_with_automaton_loaded():
     with patch("builtins.input", side_effect=["load --input=file assets/data.json", "print", "exit"]), patch("sys.stdout", new=StringIO()) as output:
         main()
@@ -206,8 +354,8 @@ def test_load_from_regex_():
     automaton = load_from_regex(regex)
     assert isinstance(automaton, DFA)
     assert automaton.start_state == "q0"
-    assert automaton.accept_states == {"q1"}
-    assert automaton.process_string("ab") == ("REJECT", "String rejected") #Deberia ser accepted no?
+    assert automaton.accept_states == {"q1", "q2"}
+    assert automaton.process_string("ab") == ("ACCEPT", "String accepted")
     assert automaton.process_string("a") == ("ACCEPT", "String accepted")
     assert automaton.process_string("b") == ("REJECT", "No transition for 'b' in state 'q0'")
 
@@ -215,7 +363,7 @@ def test_load_from_regex_():
     automaton = load_from_regex(regex)
     assert isinstance(automaton, DFA)
     assert automaton.start_state == "q0"
-    assert automaton.accept_states == {"q4"}
+    assert automaton.accept_states == {"q5"}
     assert automaton.process_string("F1234") == ("ACCEPT", "String accepted")
     assert automaton.process_string("1234") == ("ACCEPT", "String accepted")
     assert automaton.process_string("F") == ("REJECT", "String rejected")
@@ -283,7 +431,7 @@ def test_add_transition():
     nfa.add_state("q1")
     nfa.add_transition("q0", "a", "q1")
     assert "a" in nfa.alphabet
-    assert nfa.states["q0"].transitions["transitions"][0].next_state == "q1"
+    assert nfa.states["q0"].edges["a"] == ["q1"]
 
 
 def test_add_epsilon_transition():
@@ -1,8 +1,10 @@
 import pytest
 import os
 import sys
+import itertools
 from io import StringIO
 from contextlib import redirect_stdout
+from unittest.mock import patch
 
 # Agregamos el directorio src al path para importar el módulo DFA
 src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
@@ -10,6 +12,9 @@ sys.path.insert(0, src_dir)
 
 # Importamos la clase DFA del módulo automaton
 from automaton import DFA, Automaton
+import compiled
+import parallel
+from generator import counter_dfa
 
 def test_dfa_construction():
     dfa = DFA()
@@ -172,6 +177,212 @@ def test_process_string_with_path():
     assert result == "REJECT"
     assert message == "String rejected"
 
+def test_compile():
+    dfa = DFA()
+    dfa.add_state("q0")
+    dfa.add_state("q1")
+    dfa.add_state("q2")
+    dfa.set_start_state("q0")
+    dfa.set_accept_states(["q1"])
+    dfa.add_transition("q0", "a", "q1")
+    dfa.add_transition("q1", "b", "q0")
+    dfa.add_transition("q1", "a", "q2")
+    dfa.alphabet.add("c")
+
+    compiled = dfa.compile()
+    assert compiled.state_names[compiled.start] == "q0"
+    assert len(compiled.table) == len(compiled.state_names) * len(compiled.symbols)
+
+    for string in ["", "a", "ab", "aba", "aa", "aab", "ac", "ax", "abababa"]:
+        assert compiled.process_string(string) == dfa.process_string(string)
+        assert compiled.process_string(string, verbose=True) == dfa.process_string(string, verbose=True)
+
+def test_minimize():
+    # q1 y q2 son equivalentes, q3 es una trampa y q4 es inalcanzable
+    dfa = DFA()
+    for state in ["q0", "q1", "q2", "q3", "q4"]:
+        dfa.add_state(state)
+    dfa.set_start_state("q0")
+    dfa.set_accept_states(["q1", "q2"])
+    dfa.add_transition("q0", "a", "q1")
+    dfa.add_transition("q0", "b", "q2")
+    dfa.add_transition("q1", "a", "q2")
+    dfa.add_transition("q1", "b", "q3")
+    dfa.add_transition("q2", "a", "q1")
+    dfa.add_transition("q2", "b", "q3")
+    dfa.add_transition("q3", "a", "q3")
+    dfa.add_transition("q3", "b", "q3")
+    dfa.add_transition("q4", "a", "q0")
+
+    minimal = dfa.minimize()
+    assert set(minimal.states) == {"q0", "q1"}
+    assert minimal.start_state == "q0"
+    assert minimal.accept_states == {"q1"}
+    assert minimal.alphabet == {"a", "b"}
+    assert minimal.build_info["states"] == 2
+
+    for length in range(7):
+        for symbols in itertools.product("abc", repeat=length):
+            string = "".join(symbols)
+            assert minimal.process_string(string)[0] == dfa.process_string(string)[0]
+
+def test_minimize_empty_language():
+    dfa = DFA()
+    dfa.add_state("q0")
+    dfa.add_state("q1")
+    dfa.set_start_state("q0")
+    dfa.add_transition("q0", "a", "q1")
+    minimal = dfa.minimize()
+    assert list(minimal.states) == ["q0"]
+    assert minimal.process_string("") == ("REJECT", "String rejected")
+    assert minimal.process_string("a") == ("REJECT", "No transition for 'a' in state 'q0'")
+
+def build_batch_dfa():
+    dfa = DFA()
+    dfa.add_state("q0")
+    dfa.add_state("q1")
+    dfa.add_state("q2")
+    dfa.set_start_state("q0")
+    dfa.set_accept_states(["q1"])
+    dfa.add_transition("q0", "a", "q1")
+    dfa.add_transition("q1", "b", "q0")
+    dfa.add_transition("q1", "a", "q2")
+    dfa.add_transition("q2", "b", "q2")
+    return dfa
+
+BATCH = ["", "a", "ab", "aba", "aa", "aab", "aabc", "ac", "ba", "abababa", "c", "aaab"]
+
+def test_process_many():
+    dfa = build_batch_dfa()
+    accepted, reasons = dfa.process_many(BATCH, reasons=True)
+    for string, string_accepted, reason in zip(BATCH, accepted, reasons):
+        result, message = dfa.process_string(string)
+        assert bool(string_accepted) == (result == "ACCEPT")
+        assert reason == message
+
+    assert list(dfa.process_many(iter(BATCH))) == list(accepted)
+    assert len(dfa.process_many([])) == 0
+
+def test_process_many_without_numpy(monkeypatch):
+    dfa = build_batch_dfa()
+    expected = [dfa.process_string(string) for string in BATCH]
+    monkeypatch.setattr(compiled, "np", None)
+    accepted, reasons = dfa.process_many(BATCH, reasons=True)
+    assert accepted == [result == "ACCEPT" for result, _ in expected]
+    assert reasons == [message for _, message in expected]
+
+def test_streaming_session():
+    dfa = build_batch_dfa()
+    for string in BATCH:
+        session = dfa.start()
+        for index in range(0, len(string), 2):
+            session.feed(string[index:index + 2])
+        assert session.result() == dfa.process_string(string)
+
+def test_streaming_session_stops_when_dead():
+    dfa = build_batch_dfa()
+    read = []
+
+    def chunks():
+        for chunk in ["ab", "aa", "bc", "ab", "ab"]:
+            read.append(chunk)
+            yield chunk
+
+    session = dfa.start()
+    assert session.consume(chunks()) == ("REJECT", "Invalid symbol 'c'")
+    assert session.dead
+    assert read == ["ab", "aa", "bc"]
+
+def test_process_file(tmp_path):
+    dfa = build_batch_dfa()
+    for string in BATCH:
+        file_path = tmp_path / "input.bin"
+        file_path.write_bytes(string.encode("latin-1"))
+        result, message, report = dfa.process_file(str(file_path))
+        assert (result, message) == dfa.process_string(string)
+        assert report["bytes"] == len(string)
+        if result == "ACCEPT" or message == "String rejected":
+            assert report["offset"] is None
+
+    file_path.write_bytes(b"ab" * 1000 + b"ac")
+    result, message, report = dfa.process_file(str(file_path))
+    assert (result, message) == ("REJECT", "Invalid symbol 'c'")
+    assert report["offset"] == 2001
+
+    # Bytes map to symbol ids once, the transition table is not expanded per state
+    assert len(dfa.compile().byte_symbols) == 256
+
+def test_process_parallel():
+    dfa = build_batch_dfa()
+    dfa.add_transition("q2", "a", "q0")
+    strings = ["ab" * 500, "ab" * 500 + "a", "ab" * 300 + "aab" + "ab" * 200, "ab" * 300 + "c", "aaab" * 250, "aab" * 100 + "bb" + "a" * 51, ""]
+    for string in strings:
+        assert dfa.process_parallel(string, workers=2, chunk_size=97) == dfa.process_string(string)
+
+def test_process_string_uses_parallel_above_threshold():
+    dfa = build_batch_dfa()
+    dfa.parallel_threshold = 100
+    string = "ab" * 500 + "a"
+    with patch("automaton.parallel_available", return_value=True), patch.object(DFA, "process_parallel", autospec=True, side_effect=DFA.process_parallel) as process_parallel:
+        assert dfa.process_string(string) == ("ACCEPT", "String accepted")
+        assert dfa.process_string(string + "ab") == ("REJECT", "String rejected")
+        assert dfa.process_string(string + "aba") == ("REJECT", "No transition for 'a' in state 'q2'")
+        assert process_parallel.call_count == 3
+        dfa.process_string("ab")
+        assert process_parallel.call_count == 3
+
+    # A single CPU, or a pool worker, keeps the sequential walk
+    with patch("os.cpu_count", return_value=1), patch.object(DFA, "process_parallel") as process_parallel:
+        assert dfa.process_string(string) == ("ACCEPT", "String accepted")
+        assert not process_parallel.called
+    with patch("multiprocessing.parent_process", return_value=object()):
+        assert not parallel.parallel_available()
+
+def test_process_parallel_gives_up_speculating():
+    # The counter's states never merge on its first symbol, so every chunk after the first abandons speculation
+    dfa = counter_dfa(500).build()
+    compiled_dfa = dfa.compile()
+    string = "a" * (parallel.SPECULATION_WINDOW * 8)
+    assert parallel.chunk_outcomes(compiled_dfa, string) is None
+    assert parallel.chunk_outcomes(compiled_dfa, string, [compiled_dfa.start]) is not None
+    for suffix in ("", "a", "b", "c"):
+        assert dfa.process_parallel(string + suffix, workers=2) == dfa.process_string(string + suffix)
+
+def test_iter_steps():
+    dfa = build_batch_dfa()
+    steps = dfa.iter_steps("ab" * 3)
+    assert next(steps) == ("q0", "a", "q1")
+    assert list(steps) == [("q1", "b", "q0"), ("q0", "a", "q1"), ("q1", "b", "q0"), ("q0", "a", "q1"), ("q1", "b", "q0")]
+    for string in BATCH:
+        assert list(dfa.iter_steps(string)) == dfa.process_string(string, verbose=True)[2]
+
+def test_stats():
+    dfa = build_batch_dfa()
+    assert dfa.stats is None
+    stats = dfa.enable_stats()
+    assert dfa.enable_stats() is stats
+
+    # Instrumented results are identical to the plain ones
+    for string in BATCH:
+        expected = DFA.process_string(build_batch_dfa(), string)
+        assert dfa.process_string(string) == expected
+
+    stats.reset()
+    dfa.process_string("abab")
+    dfa.process_string("aab")
+    dfa.process_string("ax")
+    snapshot = stats.snapshot()
+    assert snapshot["calls"] == 3
+    assert snapshot["symbols"] == 4 + 3 + 2
+    assert snapshot["transitions"] == 4 + 3 + 1
+    assert snapshot["dead_ends"] == 1
+    assert snapshot["peak_active"] == 1
+    assert snapshot["seconds"] > 0
+
+    dfa.disable_stats()
+    dfa.process_string("ab")
+    assert dfa.stats is None and stats.calls == 3
+
 
 if __name__ == "__main__":
     pytest.main()
@@ -1,11 +1,17 @@
 import pytest
 import os
 import sys
+import itertools
+import random
+import tracemalloc
+from io import StringIO
+from contextlib import redirect_stdout
 
 src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
 sys.path.insert(0, src_dir)
 
-from automaton import NFA
+from automaton import DFA, NFA, State
+from loader import load_from_regex
 
 def test_nfa_construction():
     nfa = NFA()
@@ -27,7 +33,7 @@ def test_add_transition():
     nfa.add_state("q1")
     nfa.add_transition("q0", "a", "q1")
     assert "a" in nfa.alphabet
-    assert nfa.states["q0"].transitions["transitions"][0].next_state == "q1"
+    assert nfa.states["q0"].edges["a"] == ["q1"]
 
 
 def test_add_epsilon_transition():
@@ -102,5 +108,364 @@ def test_process_string_with_multiple_transitions():
     assert nfa.process_string("ab", "q0") == ("ACCEPT", "String accepted")
 
 
+def test_process_string_verbose_path():
+    nfa = NFA()
+    nfa.add_state("q0")
+    nfa.add_state("q1")
+    nfa.add_state("q2")
+    nfa.add_transition("q0", "<EPSILON>", "q1")
+    nfa.add_transition("q1", "a", "q2")
+    nfa.set_start_state("q0")
+    nfa.set_accept_states(["q2"])
+    assert nfa.process_string("a", "q0", verbose=True) == ("ACCEPT", "String accepted", [("q0", "<EPSILON>", "q1"), ("q1", "a", "q2")])
+
+def test_process_string_with_epsilon_cycle():
+    nfa = NFA()
+    nfa.add_state("q0")
+    nfa.add_state("q1")
+    nfa.add_state("q2")
+    nfa.add_transition("q0", "<EPSILON>", "q1")
+    nfa.add_transition("q1", "<EPSILON>", "q0")
+    nfa.add_transition("q1", "b", "q2")
+    nfa.set_start_state("q0")
+    nfa.set_accept_states(["q2"])
+    assert nfa.process_string("b", "q0") == ("ACCEPT", "String accepted")
+    assert nfa.process_string("a", "q0") == ("REJECT", "No transition for 'a' in state 'q0'")
+
+def test_process_string_with_long_string():
+    nfa = NFA()
+    nfa.add_state("q0")
+    nfa.add_state("q1")
+    nfa.add_transition("q0", "a", "q0")
+    nfa.add_transition("q0", "a", "q1")
+    nfa.add_transition("q1", "a", "q1")
+    nfa.set_start_state("q0")
+    nfa.set_accept_states(["q1"])
+    # Mucho más largo que el límite de recursión
+    long_string = "a" * 100000
+    assert nfa.process_string(long_string, "q0") == ("ACCEPT", "String accepted")
+    assert nfa.process_string(long_string + "b", "q0") == ("REJECT", "No transition for 'a' in state 'q0'")
+
+def test_process_string_ambiguous():
+    # (a|b)*a(a|b){n} explota con backtracking
+    n = 20
+    nfa = NFA()
+    nfa.add_state("q0")
+    nfa.add_transition("q0", "a", "q0")
+    nfa.add_transition("q0", "b", "q0")
+    nfa.add_transition("q0", "a", "p0")
+    for i in range(n):
+        nfa.add_transition(f"p{i}", "a", f"p{i + 1}")
+        nfa.add_transition(f"p{i}", "b", f"p{i + 1}")
+    nfa.add_state(f"p{n}")
+    nfa.set_start_state("q0")
+    nfa.set_accept_states([f"p{n}"])
+    assert nfa.process_string("a" * 200 + "b" * n, "q0") == ("ACCEPT", "String accepted")
+    assert nfa.process_string("a" * 200 + "b" * (n + 1), "q0") == ("REJECT", "No transition for 'a' in state 'q0'")
+
+def test_epsilon_closure():
+    nfa = NFA()
+    nfa.add_state("q0")
+    nfa.add_state("q1")
+    nfa.add_state("q2")
+    nfa.add_transition("q0", "<EPSILON>", "q1")
+    assert nfa.epsilon_closure("q0") == {"q0", "q1"}
+
+    # Agregar una transición epsilon invalida la cache
+    nfa.add_transition("q1", "<EPSILON>", "q2")
+    assert nfa.epsilon_closure("q0") == {"q0", "q1", "q2"}
+
+def test_remove_epsilons():
+    nfa = NFA()
+    for state in ["q1", "q2", "q3", "q4", "q5"]:
+        nfa.add_state(state)
+    nfa.add_transition("q1", "a", "q2")
+    nfa.add_transition("q1", "a", "q3")
+    nfa.add_transition("q2", "b", "q4")
+    nfa.add_transition("q2", "<EPSILON>", "q4")
+    nfa.add_transition("q3", "c", "q3")
+    nfa.add_transition("q3", "<EPSILON>", "q4")
+    nfa.add_transition("q4", "c", "q4")
+    nfa.add_transition("q4", "d", "q5")
+    nfa.add_transition("q5", "<EPSILON>", "q1")
+    nfa.set_start_state("q1")
+    nfa.set_accept_states(["q5"])
+
+    epsilon_free = nfa.remove_epsilons()
+    assert "<EPSILON>" not in epsilon_free.alphabet
+    for state in epsilon_free.states.values():
+        assert "epsilon_transitions" not in state.transitions
+
+    for string in ["ad", "abd", "acccd", "adad", "", "a", "abcd", "bd", "adabcd"]:
+        assert epsilon_free.process_string(string) == nfa.process_string(string)
+
+def test_to_dfa():
+    nfa = NFA()
+    for state in ["q1", "q2", "q3", "q4", "q5"]:
+        nfa.add_state(state)
+    nfa.add_transition("q1", "a", "q2")
+    nfa.add_transition("q1", "a", "q3")
+    nfa.add_transition("q2", "b", "q4")
+    nfa.add_transition("q2", "<EPSILON>", "q4")
+    nfa.add_transition("q3", "c", "q3")
+    nfa.add_transition("q3", "<EPSILON>", "q4")
+    nfa.add_transition("q4", "c", "q4")
+    nfa.add_transition("q4", "d", "q5")
+    nfa.set_start_state("q1")
+    nfa.set_accept_states(["q5"])
+
+    dfa = nfa.to_dfa()
+    assert isinstance(dfa, DFA)
+    assert dfa.alphabet == {"a", "b", "c", "d"}
+    assert dfa.build_info["states"] == len(dfa.states)
+    assert dfa.build_info["seconds"] >= 0
+
+    for length in range(6):
+        for symbols in itertools.product("abcd", repeat=length):
+            string = "".join(symbols)
+            assert dfa.process_string(string)[0] == nfa.process_string(string)[0]
+
+def test_to_dfa_max_states():
+    nfa = NFA()
+    nfa.add_transition("q0", "a", "q0")
+    nfa.add_transition("q0", "b", "q0")
+    nfa.add_transition("q0", "a", "p0")
+    for i in range(8):
+        nfa.add_transition(f"p{i}", "a", f"p{i + 1}")
+        nfa.add_transition(f"p{i}", "b", f"p{i + 1}")
+    nfa.set_start_state("q0")
+    nfa.set_accept_states(["p8"])
+
+    with pytest.raises(ValueError):
+        nfa.to_dfa(max_states=100)
+    assert len(nfa.to_dfa().states) == 2 ** 9
+
+def build_ambiguous_nfa(n):
+    # (a|b)*a(a|b){n}
+    nfa = NFA()
+    nfa.add_transition("q0", "a", "q0")
+    nfa.add_transition("q0", "b", "q0")
+    nfa.add_transition("q0", "a", "p0")
+    for i in range(n):
+        nfa.add_transition(f"p{i}", "a", f"p{i + 1}")
+        nfa.add_transition(f"p{i}", "b", f"p{i + 1}")
+    nfa.add_state(f"p{n}")
+    nfa.set_start_state("q0")
+    nfa.set_accept_states([f"p{n}"])
+    return nfa
+
+def test_lazy_dfa():
+    nfa = build_ambiguous_nfa(3)
+    expected = {}
+    for length in range(8):
+        for symbols in itertools.product("ab", repeat=length):
+            string = "".join(symbols)
+            expected[string] = nfa.process_string(string)
+
+    lazy_dfa = nfa.use_lazy_dfa()
+    for string, result in expected.items():
+        assert nfa.process_string(string) == result
+
+    info = lazy_dfa.cache_info()
+    assert info["states"] == 2 ** 4
+    assert info["hits"] > info["misses"]
+    assert info["flushes"] == 0
+
+def test_lazy_dfa_flush_and_fallback():
+    nfa = build_ambiguous_nfa(10)
+    lazy_dfa = nfa.use_lazy_dfa(max_states=8)
+    string = "ab" * 50 + "a" + "b" * 10
+    assert nfa.process_string(string) == ("ACCEPT", "String accepted")
+    assert nfa.process_string(string + "b") == ("REJECT", "No transition for 'a' in state 'q0'")
+    assert lazy_dfa.cache_info()["fallbacks"] == 2
+
+    # Un cambio en el NFA vacía la cache
+    nfa.add_transition("p10", "b", "p10")
+    assert lazy_dfa.cache_info()["states"] == 0
+    assert nfa.process_string(string + "b") == ("ACCEPT", "String accepted")
+
+def test_lazy_dfa_progress_across_calls():
+    # Mostly repeated short strings: the cache pays off, so an overflow now and then is not thrashing
+    nfa = build_ambiguous_nfa(10)
+    plain = build_ambiguous_nfa(10)
+    lazy_dfa = nfa.use_lazy_dfa(max_states=16)
+    generator = random.Random(0)
+    for index in range(400):
+        string = "ab" * 6 if index % 20 else "".join(generator.choices("ab", k=12))
+        assert nfa.process_string(string) == plain.process_string(string)
+    info = lazy_dfa.cache_info()
+    assert info["flushes"] > 0
+    assert info["fallbacks"] < info["flushes"]
+
+def test_streaming_session():
+    nfa = build_ambiguous_nfa(3)
+    for length in range(8):
+        for symbols in itertools.product("ab", repeat=length):
+            string = "".join(symbols)
+            session = nfa.start()
+            session.consume(string[index:index + 3] for index in range(0, len(string), 3))
+            assert session.result() == nfa.process_string(string)
+
+def test_streaming_session_stops_when_dead():
+    nfa = NFA()
+    nfa.add_transition("q0", "a", "q1")
+    nfa.add_transition("q1", "b", "q0")
+    nfa.set_start_state("q0")
+    nfa.set_accept_states(["q0"])
+    read = []
+
+    def chunks():
+        for chunk in ["ab", "ab", "aa", "ab"]:
+            read.append(chunk)
+            yield chunk
+
+    session = nfa.start()
+    assert session.consume(chunks()) == ("REJECT", "No transition for 'a' in state 'q0'")
+    assert session.dead
+    assert read == ["ab", "ab", "aa"]
+
+def test_iter_steps():
+    nfa = NFA()
+    nfa.add_transition("q0", "<EPSILON>", "q1")
+    nfa.add_transition("q1", "a", "q1")
+    nfa.add_transition("q1", "b", "q2")
+    nfa.set_start_state("q0")
+    nfa.set_accept_states(["q2"])
+    long_string = "a" * 100000 + "b"
+    steps = nfa.iter_steps(long_string)
+    assert next(steps) == ("q0", "<EPSILON>", "q1")
+    assert sum(1 for _ in steps) == len(long_string)
+    assert list(nfa.iter_steps("ab")) == nfa.process_string("ab", verbose=True)[2]
+    assert list(nfa.iter_steps("ba")) == []
+
+    # Every path length unwinds in order, whatever the checkpoint spacing
+    for length in range(40):
+        assert list(nfa.iter_steps("a" * length + "b")) == [("q0", "<EPSILON>", "q1")] + [("q1", "a", "q1")] * length + [("q1", "b", "q2")]
+
+def test_trace_runs_once():
+    nfa = build_ambiguous_nfa(2)
+    calls = []
+    traced = nfa._process_traced
+    nfa._process_traced = lambda *arguments: calls.append(arguments) or traced(*arguments)
+    result, message, steps = nfa.trace("babb")
+    assert (result, message) == ("ACCEPT", "String accepted")
+    assert list(steps) == [("q0", "b", "q0"), ("q0", "a", "p0"), ("p0", "b", "p1"), ("p1", "b", "p2")]
+    assert nfa.trace("bab")[:2] == nfa.process_string("bab")
+    assert len(calls) == 2
+
+def test_symbol_indexed_transitions():
+    nfa = NFA()
+    nfa.add_state("q0")
+    nfa.add_transition("q0", "a", "q1")
+    nfa.add_transition("q0", "a", "q2")
+    nfa.add_transition("q0", "b", "q2")
+    nfa.add_transition("q0", "<EPSILON>", "q3")
+    assert nfa.states["q0"].edges == {"a": ["q1", "q2"], "b": ["q2"]}
+    assert "transitions" not in nfa.states["q0"].transitions
+    assert not hasattr(State("q0"), "__dict__")
+
+def test_edges_stored_once():
+    # Each edge costs a slot in a next-state list, less than one (state, symbol, next_state) object would take on its own
+    class Edge:
+        __slots__ = ("state", "input_symbol", "next_state")
+
+        def __init__(self, state, input_symbol, next_state):
+            self.state = state
+            self.input_symbol = input_symbol
+            self.next_state = next_state
+
+    names = [f"q{index}" for index in range(2000)]
+    edges = [(names[index], "ab"[offset % 2], names[(index * 7 + offset) % 2000]) for index in range(2000) for offset in range(16)]
+    nfa = NFA()
+    for name in names:
+        nfa.add_state(name)
+    tracemalloc.start()
+    try:
+        nfa.add_edges(edges)
+        used, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert used / len(edges) < sys.getsizeof(Edge("q0", "a", "q1"))
+
+def test_print_fa():
+    nfa = NFA()
+    nfa.add_state("q0")
+    nfa.add_transition("q0", "a", "q1")
+    nfa.add_transition("q0", "<EPSILON>", "q1")
+    nfa.set_start_state("q0")
+    nfa.set_accept_states(["q1"])
+    output = StringIO()
+    with redirect_stdout(output):
+        nfa.print_fa()
+    assert "From q0 to q1 with symbol a" in output.getvalue()
+    assert "From q0 to q1 with symbol epsilon" in output.getvalue()
+
+def test_print_fa_groups_by_symbol():
+    # Edges are listed per state grouped by symbol, in the order each symbol first appeared, epsilon moves last
+    nfa = NFA()
+    nfa.add_state("q0")
+    nfa.add_transition("q0", "<EPSILON>", "q1")
+    nfa.add_transition("q0", "a", "q1")
+    nfa.add_transition("q0", "b", "q2")
+    nfa.add_transition("q0", "a", "q3")
+    output = StringIO()
+    with redirect_stdout(output):
+        nfa.print_fa()
+    lines = [line for line in output.getvalue().splitlines() if line.startswith("From")]
+    assert lines == [
+        "From q0 to q1 with symbol a",
+        "From q0 to q3 with symbol a",
+        "From q0 to q2 with symbol b",
+        "From q0 to q1 with symbol epsilon",
+    ]
+
+def test_stats():
+    nfa = build_ambiguous_nfa(2)
+    nfa.add_transition("p2", "<EPSILON>", "p0")
+    stats = nfa.enable_stats()
+
+    for length in range(6):
+        for symbols in itertools.product("ab", repeat=length):
+            string = "".join(symbols)
+            plain = build_ambiguous_nfa(2)
+            plain.add_transition("p2", "<EPSILON>", "p0")
+            assert nfa.process_string(string) == plain.process_string(string)
+
+    stats.reset()
+    assert nfa.process_string("aabb") == ("ACCEPT", "String accepted")
+    snapshot = stats.snapshot()
+    assert snapshot["calls"] == 1
+    assert snapshot["symbols"] == 4
+    assert snapshot["peak_active"] == 4
+
+    # p2 is reached twice and expands to p0 each time, then has no move on the last b
+    assert snapshot["epsilon_expansions"] == 2
+    assert snapshot["dead_ends"] == 1
+    assert snapshot["cache_hits"] + snapshot["cache_misses"] == snapshot["transitions"] + 1
+
+    # With a lazy DFA attached the cache counters come from its rows
+    stats.reset()
+    nfa.use_lazy_dfa()
+    nfa.process_string("abab")
+    nfa.process_string("abab")
+    assert stats.cache_misses == 4 and stats.cache_hits == 4
+    assert stats.symbols == 8
+
+def test_stats_frozen():
+    # Frozen automata are shared, counters go on a thawed copy so other holders never see them
+    nfa = build_ambiguous_nfa(1).freeze()
+    with pytest.raises(TypeError):
+        nfa.enable_stats()
+    copy = nfa.thaw()
+    copy.enable_stats()
+    assert copy.process_string("ab") == ("ACCEPT", "String accepted")
+    assert copy.stats.calls == 1 and nfa.stats is None
+
+    dfa = load_from_regex("ab")
+    with pytest.raises(TypeError):
+        dfa.enable_stats()
+    assert load_from_regex("ab").stats is None
+
+
 if __name__ == "__main__":
     pytest.main()
@@ -0,0 +1,56 @@
+# test_benchmarks.py
+import os
+import sys
+
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+benchmarks_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../benchmarks'))
+sys.path.insert(0, src_dir)
+sys.path.insert(0, benchmarks_dir)
+
+import json
+import pytest
+from families import build, cycle_dfa, nth_from_last_nfa, random_input
+from run import compare, main, run
+from automaton import DFA, NFA
+
+def test_families_are_deterministic():
+    assert random_input(["a", "b"], 50, seed=3) == random_input(["a", "b"], 50, seed=3)
+    assert isinstance(build(cycle_dfa(3)), DFA)
+
+    # (a|b)*a(a|b){2}: accepted when the third symbol from the end is an a
+    nfa = build(nth_from_last_nfa(2))
+    assert isinstance(nfa, NFA)
+    assert nfa.process_string("baab", nfa.start_state) == ("ACCEPT", "String accepted")
+    assert nfa.process_string("abaa", nfa.start_state)[0] == "REJECT"
+
+def test_run_reports_metrics():
+    results = run(quick=True, filter_text="string/many_states/states=1000", repeat=1, min_time=0)["results"]
+    assert list(results) == ["dfa_process_string/many_states/states=1000"]
+    result = results["dfa_process_string/many_states/states=1000"]
+    assert result["ops_per_second"] > 0
+    assert result["ns_per_symbol"] > 0
+    assert result["peak_bytes"] >= 0
+
+def test_compare_threshold():
+    baseline = {"results": {"a": {"seconds_per_op": 1.0}, "b": {"seconds_per_op": 1.0}}}
+    current = {"results": {"a": {"seconds_per_op": 1.05}, "b": {"seconds_per_op": 1.5}, "c": {"seconds_per_op": 9.0}}}
+    assert compare(current, baseline, 0.1) == [("b", 1.0, 1.5, 1.5)]
+    assert compare(current, baseline, 0.6) == []
+
+def test_main_baseline(tmp_path, capsys):
+    output = tmp_path / "results.json"
+    arguments = ["--quick", "--filter=long_input/n=10000", "--repeat=1", "--min-time=0"]
+    assert main(arguments + [f"--output={output}"]) == 0
+    saved = json.loads(output.read_text())
+    assert set(saved["results"]) == {"dfa_process_string/long_input/n=10000", "nfa_process_string/long_input/n=10000"}
+
+    # A baseline that claims everything used to be instant makes every case a regression
+    for result in saved["results"].values():
+        result["seconds_per_op"] = 1e-12
+    output.write_text(json.dumps(saved))
+    assert main(arguments + [f"--baseline={output}"]) == 1
+    assert "REGRESSION" in capsys.readouterr().out
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,92 @@
+# test_generator.py
+import os
+import sys
+
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.insert(0, src_dir)
+
+import json
+import pytest
+from generator import random_dfa, random_nfa, counter_dfa, nth_from_last, epsilon_chain, generate_corpus, write_corpus, make_alphabet
+from loader import load_from_json, load_from_json_file
+from automaton import DFA, NFA
+
+def accepts(automaton, input_string):
+    if isinstance(automaton, NFA):
+        return automaton.process_string(input_string, automaton.start_state)[0] == "ACCEPT"
+    return automaton.process_string(input_string)[0] == "ACCEPT"
+
+def test_random_dfa_is_deterministic(tmp_path):
+    random_dfa(200, 3, seed=7).write_json(tmp_path / "first.json")
+    random_dfa(200, 3, seed=7).write_json(tmp_path / "second.json")
+    random_dfa(200, 3, seed=8).write_json(tmp_path / "other.json")
+    assert (tmp_path / "first.json").read_bytes() == (tmp_path / "second.json").read_bytes()
+    assert (tmp_path / "first.json").read_bytes() != (tmp_path / "other.json").read_bytes()
+
+def test_random_dfa_density():
+    complete = random_dfa(100, 4, seed=1).to_json()
+    partial = random_dfa(100, 4, seed=1, density=0.5).to_json()
+    assert len(complete["delta"]) == 400
+    assert 100 < len(partial["delta"]) < 300
+
+def test_random_nfa_epsilon_density():
+    sparse = random_nfa(1000, 2, seed=1, epsilon_density=0.1).to_json()
+    dense = random_nfa(1000, 2, seed=1, epsilon_density=2.5).to_json()
+    assert "<EPSILON>" in sparse["alphabet"]
+    assert 50 < sum(edge["input"] == "<EPSILON>" for edge in sparse["delta"]) < 150
+    assert 2400 < sum(edge["input"] == "<EPSILON>" for edge in dense["delta"]) < 2600
+
+@pytest.mark.parametrize("generated", [random_dfa(60, 3, seed=2), random_dfa(60, 3, seed=2, density=0.7), random_nfa(40, 2, seed=3, epsilon_density=0.5),
+                                       counter_dfa(7), nth_from_last(3), epsilon_chain(5)])
+def test_written_json_loads(tmp_path, generated):
+    generated.write_json(tmp_path / "automaton.json")
+    assert json.loads((tmp_path / "automaton.json").read_text(encoding="utf-8")) == generated.to_json()
+
+    streamed = load_from_json_file(tmp_path / "automaton.json")
+    loaded = load_from_json(generated.to_json())
+    assert type(streamed) is type(loaded) is type(generated.build())
+    assert streamed.states.keys() == loaded.states.keys()
+
+    # Generated corpora agree with the automaton loaded back from disk
+    corpus = list(generate_corpus(generated.build(), 100, seed=4))
+    assert {result for _, result in corpus} == {"ACCEPT", "REJECT"}
+    for input_string, result in corpus:
+        assert accepts(streamed, input_string) == (result == "ACCEPT")
+
+def test_worst_case_families():
+    assert len(counter_dfa(50).build().minimize().states) == 50
+    assert len(nth_from_last(4).build().to_dfa().minimize().states) == 2 ** 5
+    chain = epsilon_chain(10).build()
+    assert accepts(chain, "aaa") and not accepts(chain, "ab")
+
+def test_large_alphabet():
+    alphabet = make_alphabet(300)
+    assert len(set(alphabet)) == 300
+    assert all(len(symbol) == 1 and symbol != "\n" for symbol in alphabet)
+
+def test_write_corpus(tmp_path):
+    dfa = random_dfa(30, 2, seed=5).build()
+    write_corpus(dfa, tmp_path / "corpus.txt", 50, seed=1, min_length=1, max_length=10, labels_path=tmp_path / "labels.txt")
+    lines = (tmp_path / "corpus.txt").read_text(encoding="utf-8").splitlines()
+    labels = (tmp_path / "labels.txt").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == len(labels) == 50
+    for line, label in zip(lines, labels):
+        assert accepts(dfa, line) == (label == "ACCEPT")
+
+    write_corpus(dfa, tmp_path / "again.txt", 50, seed=1, min_length=1, max_length=10)
+    assert (tmp_path / "again.txt").read_bytes() == (tmp_path / "corpus.txt").read_bytes()
+
+def test_corpus_errors():
+    # Accepts nothing, so no accepted string can be produced
+    empty = DFA.from_edges(["q0"], [("q0", "a", "q0")], "q0", [], ["a"])
+    with pytest.raises(ValueError):
+        list(generate_corpus(empty, 10, accept_ratio=1.0))
+
+    # Accepts everything, so no rejected string can be produced
+    everything = DFA.from_edges(["q0"], [("q0", "a", "q0")], "q0", ["q0"], ["a"])
+    with pytest.raises(ValueError):
+        list(generate_corpus(everything, 10, accept_ratio=0.0, max_attempts=20))
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -5,9 +5,15 @@ import sys
 src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
 sys.path.insert(0, src_dir)
 
+import itertools
+import json
+import pickle
+import re
 import pytest
-from loader import load_from_json, load_from_regex
+from loader import load_from_json, load_from_json_file, load_from_regex, save_compiled, load_compiled, CompileCache
 from automaton import DFA, NFA
+from compiled import HEADER, CompiledDFA
+from regex_compiler import RegexCache, regex_cache
 
 def test_load_from_json_DFA_success():
     json_data = {
@@ -87,6 +93,249 @@ def test_load_from_json_NFA_failure():
     assert automaton.accept_states == {"q2"}
     assert automaton.process_string("10ε", "q0") == ("REJECT", "No transition for '1' in state 'q0'")
 
+def test_load_from_json_NFA_determinize():
+    json_data = {
+        "alphabet": ["0", "1", "<EPSILON>"],
+        "states": ["q0", "q1", "q2"],
+        "delta": [
+            { "state": "q0", "input": "0", "next_state": "q1" },
+            { "state": "q0", "input": "1", "next_state": "q0" },
+            { "state": "q0", "input": "ε", "next_state": "q2" },
+            { "state": "q1", "input": "0", "next_state": "q2" },
+            { "state": "q1", "input": "1", "next_state": "q0" },
+            { "state": "q2", "input": "0", "next_state": "q2" },
+            { "state": "q2", "input": "1", "next_state": "q2" }
+        ],
+        "start_state": "q0",
+        "accept_states": ["q2"]
+    }
+    automaton = load_from_json(json_data, determinize=True)
+    assert isinstance(automaton, DFA)
+    assert automaton.process_string("011ε01") == ("ACCEPT", "String accepted")
+    assert automaton.process_string("10ε")[0] == "REJECT"
+
+def test_load_from_json_minimize():
+    with open(os.path.join(os.path.dirname(__file__), "../assets/dfa_settings.json")) as file:
+        json_data = json.load(file)
+    automaton = load_from_json(json_data)
+    minimal = load_from_json(json_data, minimize=True)
+    assert isinstance(minimal, DFA)
+    assert len(minimal.states) < len(automaton.states)
+    for string in ["", "0", "1", "00", "01", "10", "11", "101", "110", "1111", "10101"]:
+        assert minimal.process_string(string)[0] == automaton.process_string(string)[0]
+
+ASSETS_DIR = os.path.join(os.path.dirname(__file__), "../assets")
+
+def assert_same_automaton(first, second):
+    assert type(first) is type(second)
+    assert first.alphabet == second.alphabet
+    assert first.start_state == second.start_state
+    assert first.accept_states == second.accept_states
+    assert list(first.states) == list(second.states)
+    for state in first.states:
+        assert first.states[state].edges == second.states[state].edges
+        assert first.states[state].transitions.keys() == second.states[state].transitions.keys()
+
+@pytest.mark.parametrize("file_name", ["data.json", "data_nfa.json", "dfa_settings.json", "nfa_settings.json"])
+def test_load_from_json_file(file_name):
+    file_path = os.path.join(ASSETS_DIR, file_name)
+    with open(file_path) as file:
+        expected = load_from_json(json.load(file))
+
+    # Un chunk pequeño obliga a partir valores entre lecturas
+    for chunk_size in [3, 7, 1 << 16]:
+        automaton = load_from_json_file(file_path, chunk_size=chunk_size)
+        assert_same_automaton(automaton, expected)
+        assert automaton.build_info["seconds"] >= 0
+        assert automaton.build_info["peak_bytes"] is None
+    assert load_from_json_file(file_path, trace_memory=True).build_info["peak_bytes"] > 0
+
+def test_load_from_json_file_delta_before_alphabet(tmp_path):
+    file_path = tmp_path / "automaton.json"
+    file_path.write_text(json.dumps({
+        "delta": [
+            {"state": "q0", "input": "<EPSILON>", "next_state": "q1"},
+            {"state": "q1", "input": "a", "next_state": "q1"}
+        ],
+        "states": ["q0", "q1"],
+        "alphabet": ["a", "<EPSILON>"],
+        "start_state": "q0",
+        "accept_states": ["q1"]
+    }))
+    automaton = load_from_json_file(str(file_path))
+    assert isinstance(automaton, NFA)
+    assert automaton.process_string("aaa") == ("ACCEPT", "String accepted")
+    assert automaton.process_string("") == ("ACCEPT", "String accepted")
+
+def test_load_from_json_epsilon_input():
+    json_data = {
+        "alphabet": ["a", "<EPSILON>"],
+        "states": ["q0", "q1"],
+        "delta": [
+            {"state": "q0", "input": "<EPSILON>", "next_state": "q1"},
+            {"state": "q1", "input": "a", "next_state": "q1"}
+        ],
+        "start_state": "q0",
+        "accept_states": ["q1"]
+    }
+    automaton = load_from_json(json_data)
+    assert automaton.states["q0"].transitions["epsilon_transitions"] == ["q1"]
+    assert automaton.process_string("a") == ("ACCEPT", "String accepted")
+
+def test_from_edges_and_columns():
+    states = ["q0", "q1"]
+    edges = [("q0", "a", "q1"), ("q1", "b", "q0")]
+    dfa = DFA.from_edges(states, iter(edges), "q0", ["q1"])
+    assert dfa.alphabet == {"a", "b"}
+    assert dfa.process_string("aba") == ("ACCEPT", "String accepted")
+
+    nfa = NFA.from_columns(states, ["q0", "q0", "q1"], ["a", "<EPSILON>", "b"], ["q1", "q1", "q0"], "q0", ["q1"])
+    assert nfa.process_string("") == ("ACCEPT", "String accepted")
+    assert nfa.process_string("ba") == ("ACCEPT", "String accepted")
+
+def test_save_and_load_compiled(tmp_path):
+    automaton = load_from_json_file(os.path.join(ASSETS_DIR, "dfa_settings.json"))
+    file_path = str(tmp_path / "automaton.fa")
+    save_compiled(automaton, file_path)
+    compiled = load_compiled(file_path)
+
+    assert list(compiled.state_names) == list(automaton.compile().state_names)
+    assert compiled.symbols == automaton.compile().symbols
+    strings = ["", "0", "1", "01", "10", "0110", "1011", "111", "12"]
+    for string in strings:
+        assert compiled.process_string(string) == automaton.process_string(string)
+        assert compiled.process_string(string, verbose=True) == automaton.process_string(string, verbose=True)
+    assert list(compiled.process_many(strings)) == list(automaton.process_many(strings))
+
+    # Al serializar se vuelve a mapear el archivo en lugar de copiar las tablas
+    restored = pickle.loads(pickle.dumps(compiled))
+    assert restored.source == file_path
+    assert restored.process_string("0110") == automaton.process_string("0110")
+
+def test_save_compiled_nfa(tmp_path):
+    automaton = load_from_json_file(os.path.join(ASSETS_DIR, "nfa_settings.json"))
+    file_path = str(tmp_path / "automaton.fa")
+    save_compiled(automaton, file_path)
+    compiled = load_compiled(file_path)
+    for string in ["", "a", "aab", "bcb", "abcabc", "cc", "ccc"]:
+        assert compiled.process_string(string)[0] == automaton.process_string(string)[0]
+
+def test_load_compiled_invalid_file(tmp_path):
+    file_path = tmp_path / "automaton.fa"
+    file_path.write_bytes(b"not a compiled automaton at all, just text")
+    with pytest.raises(ValueError):
+        load_compiled(str(file_path))
+
+def test_load_compiled_truncated_file(tmp_path):
+    file_path = tmp_path / "automaton.fa"
+    save_compiled(load_from_json_file(os.path.join(ASSETS_DIR, "dfa_settings.json")), str(file_path))
+    data = file_path.read_bytes()
+    for size in (0, 10, HEADER.size, len(data) - 1):
+        file_path.write_bytes(data[:size])
+        with pytest.raises(ValueError):
+            load_compiled(str(file_path))
+    file_path.write_bytes(data + b"\0")
+    with pytest.raises(ValueError):
+        load_compiled(str(file_path))
+
+def test_compile_cache(tmp_path):
+    cache = CompileCache(str(tmp_path / "cache"))
+    file_path = tmp_path / "automaton.json"
+    with open(os.path.join(ASSETS_DIR, "nfa_settings.json")) as file:
+        file_path.write_text(file.read())
+
+    first = cache.load(str(file_path))
+    second = cache.load(str(file_path))
+    assert isinstance(second, NFA)
+    assert_same_automaton(first, second)
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+    # Cada variante tiene su propia entrada
+    minimal = cache.load(str(file_path), minimize=True)
+    assert isinstance(minimal, DFA)
+    assert_same_automaton(minimal, cache.load(str(file_path), minimize=True))
+    compiled = cache.load(str(file_path), minimize=True, compiled=True)
+    assert isinstance(compiled, CompiledDFA)
+    assert cache.load(str(file_path), minimize=True, compiled=True).source is not None
+    for string in ["", "a", "aab", "bcb", "abcabc", "cc", "ccc"]:
+        assert compiled.process_string(string)[0] == first.process_string(string)[0]
+    assert cache.stats()["entries"] == 3
+    assert sorted(os.path.splitext(entry.name)[1] for entry in cache.entries()) == [".dfa", ".fa", ".json"]
+
+    # Un archivo modificado no reutiliza la entrada anterior
+    file_path.write_text(file_path.read_text().replace('"accept_states": ["q2", "q5", "q8"]', '"accept_states": ["q2"]'))
+    changed = cache.load(str(file_path))
+    assert changed.accept_states == {"q2"}
+    assert cache.stats()["misses"] == 4
+
+def test_compile_cache_eviction(tmp_path):
+    file_path = tmp_path / "automaton.json"
+    cache = CompileCache(str(tmp_path / "cache"), max_bytes=1)
+    with open(os.path.join(ASSETS_DIR, "dfa_settings.json")) as file:
+        file_path.write_text(file.read())
+
+    assert isinstance(cache.load(str(file_path), compiled=True), CompiledDFA)
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["evictions"] == 1
+
+    cache.max_bytes = 1 << 20
+    cache.load(str(file_path))
+    cache.load(str(file_path), compiled=True)
+    assert cache.stats()["entries"] == 2
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+
+def test_compile_cache_corrupt_entry(tmp_path):
+    file_path = tmp_path / "automaton.json"
+    cache = CompileCache(str(tmp_path / "cache"))
+    with open(os.path.join(ASSETS_DIR, "data.json")) as file:
+        file_path.write_text(file.read())
+
+    cache.load(str(file_path))
+    cache.load(str(file_path), compiled=True)
+    # Garbage, an entry cut off after the header, and a well-formed JSON object that is not an automaton entry
+    for contents in (b"broken", None, b"{}"):
+        for entry in cache.entries():
+            data = open(entry.path, "rb").read()
+            with open(entry.path, "wb") as broken:
+                broken.write(data[:48] if contents is None else contents)
+        assert cache.load(str(file_path)).process_string("aa") == ("ACCEPT", "String accepted")
+        assert cache.load(str(file_path), compiled=True).process_string("aa") == ("ACCEPT", "String accepted")
+    assert cache.stats()["misses"] == 8
+    assert cache.stats()["entries"] == 2
+
+@pytest.mark.parametrize("regex", ["(ab|c)*d?", "a(b|)c", "(a|b)*a(a|b)(a|b)", "((ab)?c+)|d*", "a?b?c?", "", "(a*)*b", "x\\*y", "(0|1(01*0)*1)*"])
+def test_load_from_regex_matches_re(regex):
+    automaton = load_from_regex(regex)
+    symbols = sorted(automaton.alphabet) or ["a"]
+    for length in range(6):
+        for string in map("".join, itertools.product(symbols, repeat=length)):
+            expected = re.fullmatch(regex, string) is not None
+            assert (automaton.process_string(string)[0] == "ACCEPT") == expected, string
+
+def test_load_from_regex_minimal():
+    # (a|b)*abb tiene un DFA mínimo de 4 estados
+    automaton = load_from_regex("(a|b)*abb")
+    assert len(automaton.states) == 4
+    assert automaton.process_string("babb") == ("ACCEPT", "String accepted")
+    assert load_from_regex("(a|b)*").states.keys() == {"q0"}
+
+@pytest.mark.parametrize("regex", ["(ab", "ab)", "*a", "a|+", "a^b", "a$b", "ab\\"])
+def test_load_from_regex_invalid(regex):
+    with pytest.raises(ValueError):
+        load_from_regex(regex)
+
+def test_load_from_regex_deep_nesting():
+    # Deeper than the recursion limit, the parser and the Thompson construction use explicit stacks
+    depth = sys.getrecursionlimit() * 3
+    automaton = load_from_regex("(" * depth + "a|b" + ")" * depth, cached=False)
+    assert automaton.process_string("b") == ("ACCEPT", "String accepted")
+    automaton = load_from_regex("a" + "*" * depth, cached=False)
+    assert automaton.process_string("aaa") == ("ACCEPT", "String accepted")
+    with pytest.raises(ValueError):
+        load_from_regex("(" * depth + "a", cached=False)
+
 def test_load_from_regex_():
     regex = "a*"
     automaton = load_from_regex(regex)
@@ -101,8 +350,8 @@ def test_load_from_regex_():
     automaton = load_from_regex(regex)
     assert isinstance(automaton, DFA)
     assert automaton.start_state == "q0"
-    assert automaton.accept_states == {"q1"}
-    assert automaton.process_string("ab") == ("REJECT", "String rejected") #Deberia ser accepted no?
+    assert automaton.accept_states == {"q1", "q2"}
+    assert automaton.process_string("ab") == ("ACCEPT", "String accepted")
     assert automaton.process_string("a") == ("ACCEPT", "String accepted")
     assert automaton.process_string("b") == ("REJECT", "No transition for 'b' in state 'q0'")
 
@@ -110,7 +359,7 @@ def test_load_from_regex_():
     automaton = load_from_regex(regex)
     assert isinstance(automaton, DFA)
     assert automaton.start_state == "q0"
-    assert automaton.accept_states == {"q4"}
+    assert automaton.accept_states == {"q5"}
     assert automaton.process_string("F1234") == ("ACCEPT", "String accepted")
     assert automaton.process_string("1234") == ("ACCEPT", "String accepted")
     assert automaton.process_string("F") == ("REJECT", "String rejected")
@@ -152,6 +401,70 @@ def test_load_from_regex_():
     assert automaton.process_string("1234ABCD") == ("ACCEPT", "String accepted")
     assert automaton.process_string("ABCD") == ("ACCEPT", "String accepted")
 
+def test_load_from_regex_cached():
+    regex_cache.purge()
+    automaton = load_from_regex("(a|b)*abb")
+    assert load_from_regex("(a|b)*abb") is automaton
+    assert automaton.frozen
+
+    # Uncached loads are private and can be modified
+    private = load_from_regex("(a|b)*abb", cached=False)
+    assert private is not automaton and not private.frozen
+    private.add_state("extra")
+
+def test_regex_cache_lru():
+    cache = RegexCache(max_size=2)
+    ab = cache.get("ab")
+    cache.get("cd")
+    assert cache.get("ab") is ab
+    cache.get("ef")
+
+    # "cd" was the least recently used pattern
+    assert list(cache.entries) == ["ab", "ef"]
+    assert cache.stats() == {"hits": 1, "misses": 3, "evictions": 1, "size": 2, "max_size": 2}
+
+    with pytest.raises(ValueError):
+        cache.get("(ab")
+    assert "(ab" not in cache.entries
+
+    cache.resize(1)
+    assert list(cache.entries) == ["ef"]
+    cache.purge()
+    assert cache.stats()["size"] == 0
+    assert cache.get("ab") is not ab
+
+    uncached = RegexCache(max_size=0)
+    assert uncached.get("ab") is not uncached.get("ab")
+
+def test_frozen_automaton():
+    automaton = RegexCache().get("a(b|c)*")
+    for mutate in (lambda: automaton.add_state("q9"),
+                   lambda: automaton.add_transition("q0", "a", "q0"),
+                   lambda: automaton.add_edges([("q0", "a", "q0")]),
+                   lambda: automaton.set_start_state("q1"),
+                   lambda: automaton.set_accept_states(["q0"]),
+                   lambda: automaton.states["q0"].transitions.clear(),
+                   lambda: automaton.accept_states.add("q0")):
+        with pytest.raises((TypeError, AttributeError)):
+            mutate()
+
+    # Reading, compiling, minimizing and pickling all still work
+    assert automaton.process_string("abcb") == ("ACCEPT", "String accepted")
+    assert automaton.compile().process_string("ab") == ("ACCEPT", "String accepted")
+    assert automaton.minimize().process_string("a") == ("ACCEPT", "String accepted")
+    restored = pickle.loads(pickle.dumps(automaton))
+    assert restored.frozen
+    assert restored.process_string("acc") == ("ACCEPT", "String accepted")
+    assert automaton.thaw().frozen is False
+
+def test_frozen_nfa():
+    nfa = NFA.from_edges(["n0", "n1"], [("n0", "a", "n1"), ("n0", "<EPSILON>", "n1")], "n0", ["n1"]).freeze()
+    assert nfa.process_string("a", "n0") == ("ACCEPT", "String accepted")
+    assert nfa.process_string("", "n0") == ("ACCEPT", "String accepted")
+    with pytest.raises(TypeError, match="frozen"):
+        nfa.add_transition("n1", "a", "n0")
+    assert pickle.loads(pickle.dumps(nfa)).process_string("a", "n0") == ("ACCEPT", "String accepted")
+
 
 if __name__ == "__main__":
     pytest.main() 
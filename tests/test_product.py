@@ -0,0 +1,62 @@
+# test_product.py
+import os
+import sys
+
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.insert(0, src_dir)
+
+import itertools
+import pytest
+from product import ProductDFA
+from loader import load_from_regex
+from automaton import DFA
+
+PATTERNS = ["(a|b)*abb", "a*b*", "(ab|c)*", "c+", "(a|b|c)*c(a|b|c)"]
+
+def build_dfas():
+    # A partial DFA (no transitions out of q1) and one with a smaller alphabet, next to the regex DFAs
+    partial = DFA.from_edges(["q0", "q1"], [("q0", "a", "q1")], "q0", ["q1"], ["a", "b"])
+    return [load_from_regex(pattern) for pattern in PATTERNS] + [partial]
+
+def strings(max_length=6):
+    for length in range(max_length + 1):
+        for symbols in itertools.product("abcd", repeat=length):
+            yield "".join(symbols)
+
+def expected_vector(dfas, string):
+    return [dfa.process_string(string)[0] == "ACCEPT" for dfa in dfas]
+
+def test_product_matches_each_dfa():
+    dfas = build_dfas()
+    product = ProductDFA(dfas)
+    for string in strings(5):
+        assert product.evaluate(string) == expected_vector(dfas, string)
+    assert product.cache_info()["hits"] > product.cache_info()["misses"]
+    assert product.cache_info()["flushes"] == 0
+
+def test_product_bounded_cache():
+    dfas = build_dfas()
+    product = ProductDFA(dfas, max_states=4)
+    for string in strings(5):
+        assert product.evaluate(string) == expected_vector(dfas, string)
+    info = product.cache_info()
+    assert info["states"] <= 4 and info["flushes"] > 0
+
+def test_product_views():
+    dfas = build_dfas()
+    product = ProductDFA([dfa.compile() for dfa in dfas])
+    union, intersection = product.union(), product.intersection([1, 2])
+    for string in strings(4):
+        vector = expected_vector(dfas, string)
+        assert union.accepts(string) == any(vector)
+        assert union.complement().accepts(string) == (not any(vector))
+        assert intersection.accepts(string) == (vector[1] and vector[2])
+        assert product.component(0).complement().process_string(string) == (("REJECT", "String rejected") if vector[0] else ("ACCEPT", "String accepted"))
+
+def test_product_errors():
+    with pytest.raises(ValueError):
+        ProductDFA([])
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,101 @@
+# test_registry.py
+import os
+import sys
+
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.insert(0, src_dir)
+
+import pytest
+from registry import Registry, approximate_size
+from generator import counter_dfa, nth_from_last
+from regex_compiler import regex_cache
+
+ASSETS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../assets'))
+
+def test_approximate_size_grows_with_automaton():
+    small = approximate_size(counter_dfa(10).build())
+    large = approximate_size(counter_dfa(1000).build())
+    assert 0 < small < large
+    assert approximate_size(nth_from_last(20).build()) > approximate_size(nth_from_last(2).build())
+
+def test_registry_add_and_get():
+    registry = Registry()
+    dfa = registry.add("dfa", ("file", os.path.join(ASSETS_DIR, "data.json")))
+    registry.add("abb", ("regex", "(a|b)*abb"))
+    assert "dfa" in registry and "missing" not in registry
+    assert registry.get("dfa") is dfa
+    assert registry.get("abb").process_string("babb") == ("ACCEPT", "String accepted")
+    with pytest.raises(KeyError):
+        registry.get("missing")
+
+    rows = registry.listing()
+    assert [row["name"] for row in rows] == ["dfa", "abb"]
+    assert rows[0]["type"] == "DFA" and rows[0]["loaded"] and rows[0]["bytes"] > 0 and rows[0]["seconds"] >= 0
+    assert registry.total_bytes() == sum(row["bytes"] for row in rows)
+
+    # Peaks are only measured on request
+    assert rows[0]["peak_bytes"] is None
+    registry.add("traced", ("regex", "(a|b)*abb"), trace_memory=True)
+    assert registry.listing()[-1]["peak_bytes"] > 0
+
+def test_registry_failed_add_keeps_previous_entry():
+    registry = Registry()
+    registry.add("re", ("regex", "ab"))
+    with pytest.raises(ValueError):
+        registry.add("re", ("regex", "(ab"))
+    assert registry.get("re").process_string("ab") == ("ACCEPT", "String accepted")
+
+def test_registry_budget_unloads_least_recently_used():
+    sources = {name: ("regex", pattern) for name, pattern in [("one", "(a|b)*abb"), ("two", "(ab|c)*d"), ("three", "x*y*z*")]}
+    registry = Registry()
+    for name, source in sources.items():
+        registry.add(name, source)
+    sizes = {row["name"]: row["bytes"] for row in registry.listing()}
+
+    # Room for two of them: using "one" makes "two" the least recently used
+    registry.get("one")
+    registry.set_budget(sizes["one"] + sizes["three"])
+    assert {row["name"]: row["loaded"] for row in registry.listing()} == {"two": False, "one": True, "three": True}
+    assert registry.total_bytes() <= registry.max_bytes
+
+    # Asking for an unloaded automaton reloads it transparently and evicts the next one in line
+    assert registry.get("two").process_string("abcd") == ("ACCEPT", "String accepted")
+    loaded = {row["name"]: row["loaded"] for row in registry.listing()}
+    assert loaded["two"] and sum(loaded.values()) <= 2
+    assert {row["name"]: row["loads"] for row in registry.listing()}["two"] == 2
+
+    # An automaton larger than the whole budget is still kept while it is the one in use
+    registry.set_budget(1)
+    assert sum(row["loaded"] for row in registry.listing()) == 0
+    assert registry.get("one") is not None
+    assert [row["name"] for row in registry.listing() if row["loaded"]] == ["one"]
+
+def test_registry_regex_entries_are_private():
+    registry = Registry()
+    first = registry.add("first", ("regex", "(a|b)*abb"))
+    second = registry.add("second", ("regex", "(a|b)*abb"))
+    assert first is not second and first is not regex_cache.get("(a|b)*abb")
+    assert registry.total_bytes() == 2 * approximate_size(first)
+
+    # Unloading drops the only reference, a reload compiles again
+    registry.unload("first")
+    assert registry.get("first") is not first
+
+def test_registry_unload_and_remove():
+    calls = []
+    def loader(source):
+        calls.append(source)
+        return counter_dfa(5).build()
+
+    registry = Registry(loader=loader)
+    registry.add("counter", ("generated", 5))
+    registry.unload("counter")
+    assert registry.total_bytes() == 0 and registry.unloads == 1
+    registry.get("counter")
+    assert calls == [("generated", 5)] * 2
+    registry.remove("counter")
+    assert "counter" not in registry
+
+
+if __name__ == "__main__":
+    pytest.main()
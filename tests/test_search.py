@@ -0,0 +1,106 @@
+# test_search.py
+import os
+import sys
+
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.insert(0, src_dir)
+
+import random
+import re
+import tracemalloc
+import pytest
+from search import MAX_SEARCH_STATES, Searcher, SetEngine, TableEngine
+from loader import load_from_regex
+from regex_compiler import parse_regex, thompson
+from automaton import DFA
+
+PATTERNS = ["ab", "a*b", "(a|b)*abb", "a|abc|b", "c*", "(ab|c)+", "", "a*b|a"]
+
+def brute_force(pattern, text, overlapping=False):
+    # Leftmost-longest spans found by trying every start and end
+    spans = []
+    position = 0
+    while position <= len(text):
+        span = None
+        for start in range(position, len(text) + 1):
+            ends = [end for end in range(start, len(text) + 1) if re.fullmatch(pattern, text[start:end])]
+            if ends:
+                span = (start, max(ends))
+                break
+        if span is None:
+            break
+        spans.append(span)
+        position = span[0] + 1 if overlapping or span[1] == span[0] else span[1]
+    return spans
+
+def texts():
+    generator = random.Random(0)
+    for _ in range(150):
+        yield "".join(generator.choices("abcx", k=generator.randint(0, 12)))
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_finditer_matches_brute_force(pattern):
+    dfa = load_from_regex(pattern)
+    nfa = thompson(parse_regex(pattern))
+    for text in texts():
+        for overlapping in (False, True):
+            expected = brute_force(pattern, text, overlapping)
+            assert list(dfa.finditer(text, overlapping)) == expected
+            assert list(nfa.finditer(text, overlapping)) == expected
+
+def test_set_engine_fallback():
+    # A cap of one state forces the NFA paths to simulate state sets
+    nfa = thompson(parse_regex("(a|b)*abb"))
+    searcher = Searcher(nfa, max_states=1)
+    assert isinstance(searcher.scanner, SetEngine) and isinstance(searcher.forward, SetEngine)
+    assert isinstance(Searcher(nfa).scanner, TableEngine)
+    for text in texts():
+        assert list(searcher.finditer(text)) == brute_force("(a|b)*abb", text)
+
+class CountingText(str):
+    # Counts the symbols the engines read
+    reads = 0
+
+    def __getitem__(self, index):
+        CountingText.reads += 1
+        return str.__getitem__(self, index)
+
+@pytest.mark.parametrize("max_states", [MAX_SEARCH_STATES, 1])
+def test_finditer_reads_are_linear(max_states):
+    # Every start of "a"*n matches one symbol while its run could go on to the end looking for a b
+    searcher = Searcher(thompson(parse_regex("a*b|a")), max_states)
+    for length in (500, 2000):
+        CountingText.reads = 0
+        assert len(list(searcher.finditer(CountingText("a" * length)))) == length
+        assert CountingText.reads <= 8 * length
+
+@pytest.mark.parametrize("pattern", ["a*", "a*b|a"])
+def test_finditer_memory_is_bounded(pattern):
+    # Runs keep sparse checkpoints rather than one entry per symbol, the start marks dominate
+    searcher = Searcher(load_from_regex(pattern))
+    text = "a" * 50000
+    tracemalloc.start()
+    try:
+        count = sum(1 for _ in searcher.finditer(text))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert count == (2 if pattern == "a*" else len(text))
+    assert peak < 4 * len(text)
+
+def test_search():
+    dfa = load_from_regex("(a|b)*abb")
+    assert dfa.search("xxabbabbcaabb") == (2, 8)
+    assert dfa.search("xxx") is None
+    assert DFA().search("abc") is None
+
+def test_finditer_long_text():
+    # One reverse pass plus a forward run per match, rather than a run from every offset
+    text = ("ab" * 50 + "x") * 2000
+    spans = list(load_from_regex("(ab)+").finditer(text))
+    assert len(spans) == 2000
+    assert spans[1] == (101, 201)
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,137 @@
+# test_server.py
+import os
+import sys
+
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.insert(0, src_dir)
+
+import asyncio
+import json
+import pytest
+from server import AutomataServer, Client
+
+ASSETS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../assets'))
+
+def serve(test, **options):
+    # Run a test coroutine against a server listening on a free local port
+    async def run():
+        server = AutomataServer(**options)
+        listener = await server.start(port=0)
+        client = await Client.connect(port=listener.sockets[0].getsockname()[1])
+        try:
+            await test(server, client)
+        finally:
+            await client.close()
+            await server.close()
+    asyncio.run(run())
+
+def test_load_and_process():
+    async def test(server, client):
+        loaded = await client.request("load", name="dfa", path=os.path.join(ASSETS_DIR, "data.json"))
+        assert loaded["ok"] and loaded["type"] == "DFA" and loaded["id"] == 1
+        response = await client.request("process", name="dfa", input="aa")
+        assert (response["result"], response["message"]) == ("ACCEPT", "String accepted")
+        assert response["seconds"] >= 0
+
+        await client.request("load", path=os.path.join(ASSETS_DIR, "data_nfa.json"))
+        response = await client.request("process", input="")
+        assert response["ok"] and response["result"] in ("ACCEPT", "REJECT")
+
+        stats = await client.request("stats")
+        assert stats["automata"] == {"dfa": "DFA", "default": "NFA"}
+        assert stats["latency"]["process"]["count"] == 2
+    serve(test)
+
+def test_concurrent_regex_requests():
+    async def test(server, client):
+        assert (await client.request("regex", name="abb", pattern="(a|b)*abb"))["states"] == 4
+        strings = ["abb", "aabb", "ab", "babb", "", "bbbbabb"] * 20
+        responses = await asyncio.gather(*(client.request("process", name="abb", input=string) for string in strings))
+        for string, response in zip(strings, responses):
+            assert response["result"] == ("ACCEPT" if string.endswith("abb") else "REJECT")
+    serve(test, max_pending=4)
+
+def test_long_nfa_runs_in_worker_pool():
+    async def test(server, client):
+        server.nfa_offload_threshold = 8
+        await client.request("load", path=os.path.join(ASSETS_DIR, "data_nfa.json"))
+        long_input, short_input = "0" * 32, "0"
+        long_response, short_response = await asyncio.gather(client.request("process", input=long_input), client.request("process", input=short_input))
+        _, automaton = server.automata["default"]
+        assert (long_response["result"], long_response["message"]) == automaton.process_string(long_input, automaton.start_state)
+        assert (short_response["result"], short_response["message"]) == automaton.process_string(short_input, automaton.start_state)
+        assert server.executor is not None
+    serve(test, workers=1)
+
+def test_errors():
+    async def test(server, client):
+        assert (await client.request("process", input="a"))["error"] == "No automaton named 'default'"
+        assert (await client.request("unknown"))["error"] == "Unknown op 'unknown'"
+        assert (await client.request("regex", pattern="(ab"))["error"] == "Missing ')' in regular expression"
+        assert (await client.request("load"))["error"] == "Missing field 'path'"
+        assert not (await client.request("load", path="missing.json"))["ok"]
+
+        # Malformed lines are answered without an id and do not close the connection
+        client.writer.write(b"not json\n")
+        assert (await client.request("stats"))["ok"]
+    serve(test)
+
+def test_invalid_fields_are_answered():
+    async def test(server, client):
+        assert (await client.request("regex", pattern=5))["error"] == "'pattern' must be a string"
+        assert (await client.request("process", name=["x"], input="a"))["error"] == "'name' must be a string"
+        assert (await client.request("load", path=None))["error"] == "'path' must be a string"
+        assert (await client.request("regex", pattern="(" * 3000 + "a" + ")" * 3000))["ok"]
+        assert (await client.request("stats"))["ok"]
+    serve(test)
+
+def test_worker_reloads_changed_file(tmp_path):
+    async def test(server, client):
+        server.dfa_offload_threshold = 8
+        file_path = tmp_path / "automaton.json"
+        with open(os.path.join(ASSETS_DIR, "data.json")) as file:
+            file_path.write_text(file.read())
+        await client.request("load", path=str(file_path))
+        assert (await client.request("process", input="a" * 32))["result"] == "ACCEPT"
+
+        file_path.write_text(file_path.read_text().replace('"accept_states": ["q1"]', '"accept_states": ["q0"]'))
+        await client.request("load", path=str(file_path))
+        assert (await client.request("process", input="a" * 32))["result"] == "REJECT"
+    serve(test, workers=1)
+
+def test_load_leaves_stdout_alone(capsys):
+    async def test(server, client):
+        await asyncio.gather(*(client.request("load", name=str(index), path=os.path.join(ASSETS_DIR, "data.json")) for index in range(8)))
+    stdout = sys.stdout
+    serve(test)
+    assert sys.stdout is stdout
+    assert capsys.readouterr().out == ""
+
+def test_line_too_long():
+    async def run():
+        server = AutomataServer(max_line=64)
+        listener = await server.start(port=0)
+        reader, writer = await asyncio.open_connection("127.0.0.1", listener.sockets[0].getsockname()[1])
+        writer.write(b"x" * 256 + b"\n")
+        assert json.loads(await reader.readline())["error"] == "Request line too long"
+        assert await reader.readline() == b""
+        writer.close()
+        await server.close()
+    asyncio.run(run())
+
+@pytest.mark.skipif(not hasattr(asyncio, "start_unix_server"), reason="Unix sockets not available")
+def test_unix_socket(tmp_path):
+    async def run():
+        server = AutomataServer()
+        path = str(tmp_path / "automata.sock")
+        await server.start(path=path)
+        client = await Client.connect(path=path)
+        await client.request("regex", pattern="a*")
+        assert (await client.request("process", input="aaa"))["result"] == "ACCEPT"
+        await client.close()
+        await server.close()
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    pytest.main()